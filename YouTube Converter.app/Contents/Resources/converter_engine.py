@@ -0,0 +1,1891 @@
+#!/usr/bin/env python3
+import argparse
+import collections
+import itertools
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from app_support import format_bytes
+from tool_registry import SEARCH_DIRS, tools
+from transcode import (
+    ORIGINAL_FORMAT,
+    StreamTranscode,
+    Transcode,
+    audio_quality_level,
+    minimum_source_bitrate,
+    output_extension,
+    source_format_args,
+    stream_probe
+)
+from ytdlp_pool import YtDlpPool, pool_available
+
+_path_dirs = os.environ.get("PATH", "").split(os.pathsep)
+os.environ["PATH"] = os.pathsep.join([d for d in SEARCH_DIRS if d not in _path_dirs] + _path_dirs)
+
+QUALITY_OPTIONS = {
+    "mp3": ["128 kbps", "192 kbps", "256 kbps", "320 kbps"],
+    "m4a": ["128 kbps", "192 kbps", "256 kbps", "320 kbps"],
+    "wav": ["Lossless (16-bit)", "Lossless (24-bit)"],
+    ORIGINAL_FORMAT: ["Best available"],
+    "mp4": ["360p", "480p", "720p", "1080p", "1440p", "2160p (4K)"]
+}
+
+AUDIO_FORMATS = ["mp3", "m4a", "wav", ORIGINAL_FORMAT]
+ORIGINAL_SUFFIX = " (original)"
+DEFAULT_PLAYLIST_WORKERS = 4
+DEFAULT_TRANSCODE_WORKERS = os.cpu_count() or 2
+PIPELINE_QUEUE_DEPTH = 2
+VIDEO_AUDIO_KBPS = 128
+FRAGMENT_LEVELS = [1, 2, 4, 8, 16]
+DEFAULT_FRAGMENTS = 4
+FRAGMENT_MIN_SAMPLE_BYTES = 8 * 1024 * 1024
+FRAGMENT_RETUNE_SAMPLES = 8
+FRAGMENT_SMOOTHING = 0.3
+MIN_RATE_SHARE = 64 * 1024
+MAX_ITEM_ATTEMPTS = 3
+RETRY_DELAY = 2.0
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 120.0
+THROTTLE_RATIO = 0.25
+THROUGHPUT_MIN_SAMPLE_BYTES = 1024 * 1024
+THROUGHPUT_SMOOTHING = 0.3
+THROTTLE_MARKERS = ["HTTP Error 429", "Too Many Requests", "rate-limited", "rate limited"]
+PERMANENT_ERROR_MARKERS = [
+    "Video unavailable",
+    "Private video",
+    "This video is private",
+    "This video is not available",
+    "members-only",
+    "confirm your age",
+    "copyright",
+    "ffmpeg could not convert"
+]
+RATE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+BACKENDS = ["subprocess", "pool"]
+DEFAULT_BACKEND = os.environ.get("YTC_BACKEND", "subprocess")
+DEFAULT_STREAM = os.environ.get("YTC_STREAM") == "1"
+OUTPUT_TAIL_LINES = 20
+
+PROGRESS_PREFIX = "__PROGRESS__"
+POSTPROCESS_PREFIX = "__POSTPROCESS__"
+DONE_PREFIX = "__DONE__"
+FILE_PREFIX = "__FILE__"
+FORMAT_PREFIX = "__FORMAT__"
+ABR_PREFIX = "__ABR__"
+STEM_PREFIX = "__STEM__"
+INFO_PREFIX = "__INFO__"
+PROGRESS_TEMPLATES = [
+    "download:" + PROGRESS_PREFIX
+    + "%(progress.{status,downloaded_bytes,total_bytes,total_bytes_estimate,speed,eta,filename,fragment_count})j",
+    "postprocess:" + POSTPROCESS_PREFIX + "%(progress.{status,postprocessor})j"
+]
+DOWNLOAD_PRINTS = [
+    "after_move:" + DONE_PREFIX + "%(title)s",
+    "after_move:" + FILE_PREFIX + "%(filepath)s",
+    "after_move:" + FORMAT_PREFIX + "%(format_id)s",
+    "after_move:" + ABR_PREFIX + "%(abr)s"
+]
+# With "-o -" yt-dlp skips after_move, so streamed items report their details before the download starts.
+STREAM_PRINTS = [
+    "before_dl:" + STEM_PREFIX + "%(title)S",
+    "before_dl:" + INFO_PREFIX + "%(.{title,format_id,acodec,abr})j"
+]
+
+
+def build_yt_dlp_command(url, selected_format, quality, output_template, playlist_mode=False, executable=None):
+    cmd = [executable or tools.require("yt-dlp")]
+
+    ffmpeg_path = tools.path("ffmpeg")
+    if ffmpeg_path:
+        cmd.extend(["--ffmpeg-location", ffmpeg_path])
+
+    if playlist_mode:
+        cmd.extend(["--yes-playlist", "--ignore-errors"])
+
+    if selected_format == ORIGINAL_FORMAT:
+        cmd.extend(["-f", "bestaudio/best"])
+        if ffmpeg_path:
+            cmd.append("--embed-metadata")
+
+    elif selected_format in AUDIO_FORMATS:
+        cmd.extend(source_format_args([(selected_format, quality)]))
+        cmd.extend(["-x", "--audio-format", selected_format])
+
+        if selected_format in ["mp3", "m4a"]:
+            cmd.extend(["--audio-quality", str(audio_quality_level(quality))])
+
+    elif selected_format == "mp4":
+        resolution_map = {
+            "360p": "360",
+            "480p": "480",
+            "720p": "720",
+            "1080p": "1080",
+            "1440p": "1440",
+            "2160p (4K)": "2160"
+        }
+        res = resolution_map.get(quality, "720")
+        # Highest resolution up to the cap, then H.264/AAC that mux into MP4 without re-encoding,
+        # then the smallest file.
+        cmd.extend([
+            "-S", f"res:{res},vcodec:h264,acodec:aac,abr~{VIDEO_AUDIO_KBPS},+size",
+            "-f", f"bestvideo[height<={res}]+bestaudio/best[height<={res}]",
+            "--merge-output-format", "mp4"
+        ])
+
+    cmd.extend(["-o", output_template, url])
+    return cmd
+
+
+def build_source_command(url, output_template, executable=None, targets=None):
+    return [
+        executable or tools.require("yt-dlp"),
+        *source_format_args(targets or []),
+        "-o", output_template,
+        url
+    ]
+
+
+def build_stream_command(url, targets, executable=None):
+    return [executable or tools.require("yt-dlp"), *source_format_args(targets), "-o", "-", url]
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def parse_rate(value):
+    text = str(value or "").strip().lower()
+    if text in ("", "0", "off", "none", "unlimited"):
+        return None
+    match = re.fullmatch(r"([\d.]+)\s*([kmg]?)(?:i?b)?(?:/s)?", text)
+    if not match:
+        raise ValueError(f"Unknown rate '{value}': use a value such as 500K, 2M or 1.5MiB/s")
+    rate = float(match.group(1)) * RATE_UNITS[match.group(2)]
+    return int(rate) if rate > 0 else None
+
+
+def format_rate(rate):
+    return f"{format_bytes(rate)}/s" if rate else "Unlimited"
+
+
+def describe_progress(progress):
+    if progress.phase != "download":
+        return "Converting..." if progress.phase == "postprocess" else "Finishing..."
+    text = f"{progress.percent:.0f}%"
+    if progress.speed:
+        text += f" at {format_bytes(progress.speed)}/s"
+    if progress.eta is not None:
+        text += f", ETA {format_eta(progress.eta)}"
+    return text
+
+
+def is_playlist_url(url):
+    return bool(re.search(r"[?&]list=", url))
+
+
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def extract_video_id(url):
+    match = re.search(r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([\w-]{11})", url)
+    return match.group(1) if match else None
+
+
+def resolve_quality(selected_format, value=None):
+    options = QUALITY_OPTIONS[selected_format]
+    if not value:
+        return options[0]
+    wanted = value.strip().lower()
+    for option in options:
+        if option.lower() == wanted or option.lower().startswith(wanted):
+            return option
+    for option in options:
+        if wanted in option.lower():
+            return option
+    raise ValueError(f"Unknown quality '{value}' for {selected_format}: choose from {', '.join(options)}")
+
+
+class SubprocessBackend:
+    name = "subprocess"
+
+    def executable(self):
+        return tools.require("yt-dlp")
+
+    def supports(self, flag):
+        return tools.supports("yt-dlp", flag)
+
+    def spawn(self, cmd, merge_stderr=True):
+        return subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            env=os.environ
+        )
+
+    def close(self):
+        pass
+
+
+class PoolBackend:
+    name = "pool"
+
+    def __init__(self, size=DEFAULT_PLAYLIST_WORKERS):
+        if not pool_available():
+            raise RuntimeError("The pool backend needs the yt_dlp Python package (pip install yt-dlp).")
+        self.pool = YtDlpPool(size)
+
+    def executable(self):
+        return "yt-dlp"
+
+    def supports(self, flag):
+        return True
+
+    def spawn(self, cmd, merge_stderr=True):
+        return self.pool.start(cmd[1:])
+
+    def close(self):
+        self.pool.close()
+
+
+def create_backend(name=None, size=DEFAULT_PLAYLIST_WORKERS):
+    name = name or DEFAULT_BACKEND
+    if name == "subprocess":
+        return SubprocessBackend()
+    if name == "pool":
+        return PoolBackend(size)
+    raise ValueError(f"Unknown backend '{name}': choose from {', '.join(BACKENDS)}")
+
+
+def parse_targets(formats, qualities=None):
+    formats = [value.strip().lower() for value in formats.split(",") if value.strip()]
+    qualities = [value.strip() for value in (qualities or "").split(",")]
+    if not formats:
+        raise ValueError("No output format given")
+    if len(set(formats)) != len(formats):
+        raise ValueError("Each output format can only be requested once")
+
+    targets = []
+    for position, selected_format in enumerate(formats):
+        if selected_format not in QUALITY_OPTIONS:
+            raise ValueError(f"Unknown format '{selected_format}': choose from {', '.join(QUALITY_OPTIONS)}")
+        if len(formats) > 1 and selected_format not in AUDIO_FORMATS:
+            raise ValueError(f"{selected_format} cannot be combined with other formats")
+        quality = qualities[position] if position < len(qualities) else None
+        targets.append((selected_format, resolve_quality(selected_format, quality)))
+    return targets
+
+
+def format_targets(targets):
+    return ",".join(fmt for fmt, _ in targets), ",".join(quality for _, quality in targets)
+
+
+def target_path(output_dir, stem, selected_format, source, targets):
+    extension = output_extension(selected_format, source)
+    # An original AAC source keeps the .m4a container that an m4a target writes too; both ffmpeg runs would
+    # share one file, so the original gets its own name.
+    if selected_format == ORIGINAL_FORMAT and any(fmt == extension for fmt, _ in targets):
+        stem += ORIGINAL_SUFFIX
+    return os.path.join(output_dir, f"{stem}.{extension}")
+
+
+def match_quality(selected_format, quality):
+    options = QUALITY_OPTIONS[selected_format]
+    return quality if quality in options else options[0]
+
+
+PLAYLIST_ENTRY_TEMPLATE = "%(.{id,title,duration,playlist_index})j"
+
+
+class PlaylistEntry:
+    def __init__(self, index, video_id, title=None, duration=None):
+        self.index = index
+        self.video_id = video_id
+        self.title = title
+        self.duration = duration
+
+    def __repr__(self):
+        return f"PlaylistEntry({self.index}, {self.video_id!r}, {self.title!r})"
+
+
+def _parse_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _parse_float(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_playlist_entry(line, position):
+    data = json.loads(line)
+    if not data.get("id"):
+        return None
+    return PlaylistEntry(
+        data.get("playlist_index") or position,
+        data["id"],
+        data.get("title"),
+        data.get("duration")
+    )
+
+
+class PlaylistProbeError(RuntimeError):
+    pass
+
+
+class PlaylistProbe:
+    def __init__(self, url, on_entry=None, backend=None):
+        self.url = url
+        self.on_entry = on_entry
+        self.backend = backend or SubprocessBackend()
+        self.entries = []
+        self.cancelled = False
+        self._process = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        cmd = [self.backend.executable(), "--flat-playlist"]
+        if self.backend.supports("--lazy-playlist"):
+            cmd.append("--lazy-playlist")
+        cmd.extend(["--print", PLAYLIST_ENTRY_TEMPLATE, "--yes-playlist", self.url])
+        error = None
+        tail = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        try:
+            with self._lock:
+                if self.cancelled:
+                    return []
+                self._process = self.backend.spawn(cmd)
+
+            for line in self._process.stdout:
+                if not line.strip():
+                    continue
+                try:
+                    entry = parse_playlist_entry(line, len(self.entries) + 1)
+                except ValueError:
+                    if error is None and line.startswith("ERROR:"):
+                        error = line.strip()
+                    tail.append(line.strip())
+                    continue
+                if entry:
+                    self.entries.append(entry)
+                    if self.on_entry:
+                        self.on_entry(entry, len(self.entries))
+            returncode = self._process.wait()
+        except Exception as e:
+            if self.cancelled:
+                return []
+            raise PlaylistProbeError(f"ERROR: could not list the playlist: {e}") from e
+        if self.cancelled:
+            return []
+        # A listing that fails partway must not pass for the whole playlist: the items would be saved as complete.
+        if returncode != 0:
+            raise PlaylistProbeError(
+                error or (tail[-1] if tail else f"ERROR: yt-dlp could not list the playlist (exit code {returncode})")
+            )
+        return self.entries
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._process and self._process.poll() is None:
+                self._process.kill()
+
+
+def list_playlist_entries(url, on_entry=None, backend=None):
+    return PlaylistProbe(url, on_entry, backend).run()
+
+
+class DownloadSlots:
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = max(1, limit) if limit else None
+            self._cond.notify_all()
+
+    def __enter__(self):
+        with self._cond:
+            while self.limit is not None and self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class BandwidthGrant:
+    def __init__(self, job, rate):
+        self.job = job
+        self.rate = rate
+        self.apply = None
+
+
+class BandwidthLimiter:
+    # A job counts from its first request until it ends, so a job still waiting for bandwidth already has
+    # its share when the cap is split. Grants whose download can take a new limit while it runs (the pool
+    # backend) are rebalanced whenever a job arrives or leaves or the cap changes; the others keep the rate
+    # they started with, and later grants make up the difference.
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._jobs = {}
+        self._grants = {}
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+
+    def set_rate(self, rate):
+        with self._cond:
+            self.rate = rate or None
+            self._changed()
+
+    def unregister(self, job):
+        with self._cond:
+            if self._jobs.pop(job.id, None) is not None:
+                self._changed()
+
+    def _changed(self):
+        self._rebalance()
+        self._cond.notify_all()
+
+    def _job_share(self):
+        return self.rate / max(1, len(self._jobs))
+
+    def _fair(self, job, downloads):
+        return self._job_share() / max(job.parallelism, downloads)
+
+    def _used(self, grants):
+        # A download that started without a cap and cannot be re-limited may use all of it.
+        return sum(self.rate if grant.rate is None else grant.rate for grant in grants)
+
+    def _share(self, job):
+        own = [grant for grant in self._grants.values() if grant.job is job]
+        fair = self._fair(job, len(own) + 1)
+        share = min(fair, self._job_share() - self._used(own), self.rate - self._used(self._grants.values()))
+        if share >= fair or share >= MIN_RATE_SHARE:
+            return share
+        return None
+
+    def _rebalance(self):
+        adjustable = [grant for grant in self._grants.values() if grant.apply]
+        if not adjustable:
+            return
+        if not self.rate:
+            rates = {grant: None for grant in adjustable}
+        else:
+            room = max(0, self.rate - self._used(grant for grant in self._grants.values() if not grant.apply))
+            wanted = {
+                grant: self._fair(grant.job, sum(1 for other in self._grants.values() if other.job is grant.job))
+                for grant in adjustable
+            }
+            scale = min(1.0, room / sum(wanted.values()))
+            rates = {grant: max(MIN_RATE_SHARE // 16, int(rate * scale)) for grant, rate in wanted.items()}
+        for grant, rate in rates.items():
+            if rate != grant.rate:
+                grant.rate = rate
+                grant.apply(rate)
+
+    def acquire(self, job):
+        with self._cond:
+            if job.id not in self._jobs:
+                self._jobs[job.id] = job
+                self._rebalance()
+            while True:
+                if job.cancelled:
+                    return None, None
+                share = self._share(job) if self.rate else None
+                if not self.rate or share:
+                    grant = next(self._ids)
+                    self._grants[grant] = BandwidthGrant(job, int(share) if share else None)
+                    return grant, self._grants[grant].rate
+                self._cond.wait(0.5)
+
+    def attach(self, grant, apply):
+        # apply(rate) changes the limit of the running download; None lifts it.
+        with self._cond:
+            if grant in self._grants:
+                self._grants[grant].apply = apply
+                self._rebalance()
+
+    def release(self, grant):
+        with self._cond:
+            if self._grants.pop(grant, None) is not None:
+                self._changed()
+
+
+def is_throttle_error(text):
+    return any(marker.lower() in (text or "").lower() for marker in THROTTLE_MARKERS)
+
+
+def is_permanent_error(text):
+    return any(marker.lower() in (text or "").lower() for marker in PERMANENT_ERROR_MARKERS)
+
+
+def _smooth(previous, value):
+    return value if previous is None else previous + THROUGHPUT_SMOOTHING * (value - previous)
+
+
+class ConcurrencyController:
+    # AIMD on top of DownloadSlots: halve the download limit when YouTube throttles, then add roughly
+    # one download per window of successful ones until the configured ceiling is back.
+    def __init__(self, slots, ceiling=None):
+        self.slots = slots
+        self.ceiling = ceiling
+        self.window = None
+        self.throughput = None
+        self.link_throughput = None
+        self._strikes = 0
+        self._backoff_until = 0
+        self._lock = threading.Lock()
+
+    def set_ceiling(self, ceiling):
+        with self._lock:
+            self.ceiling = ceiling
+            if self.window is not None and ceiling:
+                self.window = min(self.window, ceiling)
+            self._apply()
+
+    def _apply(self):
+        self.slots.set_limit(self.ceiling if self.window is None else int(self.window))
+
+    def _halve(self):
+        current = self.window if self.window is not None else (self.ceiling or max(self.slots.active, 1))
+        self.window = max(1.0, current / 2)
+        self._apply()
+
+    def throttled(self):
+        with self._lock:
+            self._halve()
+            self._strikes += 1
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self._strikes - 1)) * random.uniform(0.5, 1.5)
+            self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+
+    def _slow(self, rate, expected_rate, sharing):
+        # Downloads that share the link are slower each, so the expected rate is the smaller of the usual
+        # per-download rate and the usual total split over the downloads running now. Every sample updates
+        # both, so a lasting drop becomes the new normal instead of counting as throttled forever.
+        usual = [self.throughput, self.link_throughput / sharing if self.link_throughput else None, expected_rate]
+        usual = [value for value in usual if value]
+        self.throughput = _smooth(self.throughput, rate)
+        self.link_throughput = _smooth(self.link_throughput, rate * sharing)
+        return bool(usual) and rate < min(usual) * THROTTLE_RATIO
+
+    def succeeded(self, downloaded_bytes=0, seconds=0, expected_rate=None, sharing=1):
+        if downloaded_bytes >= THROUGHPUT_MIN_SAMPLE_BYTES and seconds > 0:
+            with self._lock:
+                # A slow download is weaker evidence than a 429: narrow the window, but no backoff.
+                if self._slow(downloaded_bytes / seconds, expected_rate, max(1, sharing)):
+                    self._halve()
+                    return
+
+        with self._lock:
+            self._strikes = 0
+            if self.window is None:
+                return
+            self.window += 1 / self.window
+            if (self.ceiling and self.window >= self.ceiling) or (not self.ceiling and self.window > self.slots.active + 1):
+                self.window = None
+            self._apply()
+
+    def wait_backoff(self, job):
+        while not job.cancelled:
+            remaining = self._backoff_until - time.monotonic()
+            if remaining <= 0:
+                return
+            job._cancelled.wait(min(remaining, 0.5))
+
+
+class FragmentTuner:
+    def __init__(self, levels=FRAGMENT_LEVELS, start=DEFAULT_FRAGMENTS):
+        self.levels = list(levels)
+        self._position = self.levels.index(start) if start in self.levels else 0
+        self._throughput = {}
+        self._settled = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            return self.levels[self._position]
+
+    def throughput(self):
+        with self._lock:
+            return dict(self._throughput)
+
+    def record(self, level, downloaded_bytes, seconds):
+        # Small downloads finish before extra connections pay off, so they say nothing about the link.
+        if level not in self.levels or downloaded_bytes < FRAGMENT_MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        with self._lock:
+            rate = downloaded_bytes / seconds
+            previous = self._throughput.get(level)
+            self._throughput[level] = rate if previous is None else previous + FRAGMENT_SMOOTHING * (rate - previous)
+            if level == self.levels[self._position]:
+                self._step()
+
+    def _step(self):
+        up, down = self._position + 1, self._position - 1
+        if up < len(self.levels) and self.levels[up] not in self._throughput:
+            self._position = up
+            return
+
+        neighbours = [i for i in (down, self._position, up) if 0 <= i < len(self.levels)]
+        best = max(neighbours, key=lambda i: self._throughput.get(self.levels[i], 0))
+        if best != self._position:
+            self._position = best
+            self._settled = 0
+            return
+
+        # Links change over time: every so often, forget the next level up so it gets measured again.
+        self._settled += 1
+        if self._settled >= FRAGMENT_RETUNE_SAMPLES and up < len(self.levels):
+            self._throughput.pop(self.levels[up], None)
+            self._settled = 0
+
+
+class ItemProgress:
+    def __init__(self, index, video_id=None, phase="download", status=None, downloaded_bytes=None,
+                 total_bytes=None, speed=None, eta=None, filepath=None, postprocessor=None, fragment_count=None):
+        self.index = index
+        self.video_id = video_id
+        self.phase = phase
+        self.status = status
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.filepath = filepath
+        self.postprocessor = postprocessor
+        self.fragment_count = fragment_count
+
+    @property
+    def percent(self):
+        if self.phase != "download":
+            return 100.0
+        if self.status == "finished":
+            return 100.0
+        if not self.total_bytes or self.downloaded_bytes is None:
+            return 0.0
+        return min(100.0, self.downloaded_bytes * 100 / self.total_bytes)
+
+    @classmethod
+    def from_download(cls, index, video_id, data):
+        return cls(
+            index,
+            video_id,
+            phase="download",
+            status=data.get("status"),
+            downloaded_bytes=data.get("downloaded_bytes"),
+            total_bytes=data.get("total_bytes") or data.get("total_bytes_estimate"),
+            speed=data.get("speed"),
+            eta=data.get("eta"),
+            filepath=data.get("filename"),
+            fragment_count=data.get("fragment_count")
+        )
+
+    @classmethod
+    def from_postprocess(cls, index, video_id, data):
+        postprocessor = data.get("postprocessor")
+        return cls(
+            index,
+            video_id,
+            phase="move" if postprocessor == "MoveFiles" else "postprocess",
+            status=data.get("status"),
+            postprocessor=postprocessor
+        )
+
+    def __repr__(self):
+        return f"ItemProgress({self.index}, {self.phase!r}, {self.percent:.1f}%)"
+
+
+class ProcessResult:
+    def __init__(self, returncode, title=None, path=None, error=None, format_id=None, stem=None, abr=None):
+        self.returncode = returncode
+        self.title = title
+        self.path = path
+        self.error = error
+        self.format_id = format_id
+        self.stem = stem
+        self.abr = abr
+
+
+class FetchedSource:
+    def __init__(self, path=None, stem=None, title=None, cached=False, error=None):
+        self.path = path
+        self.stem = stem
+        self.title = title
+        self.cached = cached
+        self.error = error
+
+
+class ItemResult:
+    def __init__(self, index, video_id, title=None, path=None, error=None, skipped=False):
+        self.index = index
+        self.video_id = video_id
+        self.title = title
+        self.path = path
+        self.error = error
+        self.skipped = skipped
+
+
+class JobEvent:
+    def __init__(self, kind, job, **data):
+        self.kind = kind
+        self.job = job
+        self.data = data
+
+    def __repr__(self):
+        return f"JobEvent({self.kind!r}, job={self.job.id}, {self.data!r})"
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, url, output_dir, selected_format, quality):
+        self.id = next(Job._ids)
+        self.kind = kind
+        self.url = url
+        self.output_dir = output_dir
+        self.format = selected_format
+        self.quality = quality
+        self.fragments = None
+        self.parallelism = 1
+        self.status = "pending"
+        self.total = 0
+        self.completed = 0
+        self.successes = []
+        self.failures = []
+        self.skipped = 0
+        self.total_duration = 0
+        self.completed_duration = 0
+        self.output_files = []
+        self.entries = []
+        self.results = {}
+        self.error = None
+        self._listeners = []
+        self._cancel_hooks = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            hooks = list(self._cancel_hooks)
+        for hook in hooks:
+            hook()
+
+    def _on_cancel(self, hook):
+        with self._lock:
+            self._cancel_hooks.append(hook)
+        if self.cancelled:
+            hook()
+
+    def _remove_cancel_hook(self, hook):
+        with self._lock:
+            if hook in self._cancel_hooks:
+                self._cancel_hooks.remove(hook)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.done else 0.0
+        return self.completed / self.total
+
+    def failed_entries(self):
+        return [
+            entry for entry in self.entries
+            if entry.index in self.results and self.results[entry.index].error
+        ]
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def emit(self, kind, **data):
+        event = JobEvent(kind, self, **data)
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception:
+                pass
+        return event
+
+    def events(self, timeout=None):
+        events = queue.Queue()
+        self.add_listener(events.put)
+        if self.done:
+            return
+        while True:
+            event = events.get(timeout=timeout)
+            yield event
+            if event.kind == "finished":
+                return
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self._done.set()
+        self.emit("finished", status=status, error=error)
+
+
+class ConverterEngine:
+    def __init__(self, workers=DEFAULT_PLAYLIST_WORKERS, max_downloads=None, archive=None, backend=None,
+                 source_cache=None, transcode_workers=DEFAULT_TRANSCODE_WORKERS, stream=DEFAULT_STREAM,
+                 fragments=None, rate_limit=None):
+        self.workers = workers
+        self.transcode_workers = max(1, transcode_workers)
+        self.slots = DownloadSlots(max_downloads)
+        self.controller = ConcurrencyController(self.slots, max_downloads)
+        self.archive = archive
+        self.backend = backend or SubprocessBackend()
+        self.source_cache = source_cache
+        self.stream = stream
+        self.fragments = fragments
+        self.fragment_tuner = FragmentTuner()
+        self.bandwidth = BandwidthLimiter(rate_limit)
+
+    def close(self):
+        self.backend.close()
+
+    def convert(self, url, output_dir, filename, selected_format, quality=None, fragments=None, listener=None):
+        job = Job("single", url, output_dir, selected_format, resolve_quality(selected_format, quality))
+        job.fragments = fragments
+        if listener:
+            job.add_listener(listener)
+        threading.Thread(target=self._run_job, args=(job, self._run_single, filename), daemon=True).start()
+        return job
+
+    def convert_playlist(self, url, output_dir, selected_format, quality=None, workers=None, items=None,
+                         fragments=None, listener=None):
+        job = Job("playlist", url, output_dir, selected_format, resolve_quality(selected_format, quality))
+        job.fragments = fragments
+        if listener:
+            job.add_listener(listener)
+        threading.Thread(
+            target=self._run_job, args=(job, self._run_playlist, workers or self.workers, items), daemon=True
+        ).start()
+        return job
+
+    def retry_failed(self, job, workers=None, listener=None):
+        # Only the failed items run again, under their original playlist indices and file names.
+        items = job.failed_entries()
+        if not items:
+            return None
+        return self.convert_playlist(
+            job.url,
+            job.output_dir,
+            job.format,
+            job.quality,
+            workers=workers,
+            items=items,
+            fragments=job.fragments,
+            listener=listener
+        )
+
+    def convert_formats(self, url, output_dir, filename, targets, fragments=None, listener=None):
+        job = Job("multi", url, output_dir, *format_targets(targets))
+        job.targets = list(targets)
+        job.fragments = fragments
+        if listener:
+            job.add_listener(listener)
+        threading.Thread(target=self._run_job, args=(job, self._run_multi, filename), daemon=True).start()
+        return job
+
+    def _run_job(self, job, run, *args):
+        try:
+            run(job, *args)
+        finally:
+            self.bandwidth.unregister(job)
+
+    def _streams(self, selected_format):
+        return self.stream and selected_format in AUDIO_FORMATS and selected_format != ORIGINAL_FORMAT
+
+    def _run_single(self, job, filename):
+        if (self.source_cache or self._streams(job.format)) and job.format in AUDIO_FORMATS:
+            job.targets = [(job.format, job.quality)]
+            self._run_multi(job, filename)
+            return
+        try:
+            job.status = "running"
+            job.total = 1
+            job.emit("started", total=1)
+
+            if filename:
+                for ext in [".mp3", ".m4a", ".wav", ".mp4"]:
+                    filename = filename.replace(ext, "")
+                extension = "%(ext)s" if job.format == ORIGINAL_FORMAT else job.format
+                output_template = os.path.join(job.output_dir, f"{filename}.{extension}")
+            else:
+                output_template = os.path.join(job.output_dir, "%(title)s.%(ext)s")
+
+            video_id = extract_video_id(job.url)
+            archived = self._archived(job, video_id)
+            if archived and (not filename or os.path.splitext(os.path.basename(archived["path"]))[0] == filename):
+                job.completed = 1
+                job.skipped = 1
+                job.successes.append(archived["title"] or filename or job.url)
+                job.output_files.append(archived["path"])
+                job.emit(
+                    "item_done",
+                    index=1,
+                    video_id=video_id,
+                    title=archived["title"],
+                    path=archived["path"],
+                    skipped=True
+                )
+                job._finish("completed")
+                return
+
+            cmd = build_yt_dlp_command(
+                job.url, job.format, job.quality, output_template, executable=self.backend.executable()
+            )
+            result = self._run_yt_dlp(job, cmd, 1, video_id)
+            if job.cancelled:
+                job._finish("cancelled")
+                return
+
+            job.completed = 1
+            if result.returncode == 0:
+                actual_file = result.path
+                title = result.title or filename
+                job.successes.append(title or job.url)
+                if actual_file:
+                    job.output_files.append(actual_file)
+                    if self.archive and video_id:
+                        self.archive.record(video_id, job.format, job.quality, job.output_dir, actual_file, title)
+                job.emit("item_done", index=1, video_id=video_id, title=title, path=actual_file)
+                job._finish("completed")
+            else:
+                error_msg = result.error or "Unknown error"
+                job.failures.append(error_msg)
+                job.emit("item_failed", index=1, error=error_msg)
+                job._finish("failed", error_msg)
+        except Exception as e:
+            job._finish("failed", str(e))
+
+    def _run_playlist(self, job, workers, items=None):
+        try:
+            job.status = "running"
+            if items is None:
+                probe = PlaylistProbe(
+                    job.url,
+                    on_entry=lambda entry, count: job.emit("enumerating", count=count, entry=entry),
+                    backend=self.backend
+                )
+                job._on_cancel(probe.cancel)
+                items = probe.run()
+
+            if job.cancelled:
+                job._finish("cancelled")
+                return
+
+            job.entries = items
+            job.total = len(items)
+            job.total_duration = sum(entry.duration or 0 for entry in items)
+            job.emit("started", total=job.total, items=items)
+
+            if not items:
+                job._finish("failed", "No playlist items were found.")
+                return
+
+            job.parallelism = min(workers, len(items))
+            os.makedirs(job.output_dir, exist_ok=True)
+            if self._streams(job.format):
+                self._download_items(job, workers, items, self._stream_playlist_item)
+            elif job.format in AUDIO_FORMATS:
+                self._run_pipeline(job, workers, items)
+            else:
+                self._download_items(job, workers, items)
+
+            if job.cancelled:
+                job._finish("cancelled")
+            elif job.failures and job.successes:
+                job._finish("partial", job.failures[0])
+            elif job.failures:
+                job._finish("failed", job.failures[0])
+            else:
+                job._finish("completed")
+        except Exception as e:
+            job._finish("failed", str(e))
+
+    def _download_items(self, job, workers, items, download=None):
+        download = download or self._download_playlist_item
+        attempts = collections.Counter()
+        executor = ThreadPoolExecutor(max_workers=min(workers, len(items)))
+        job._on_cancel(lambda: executor.shutdown(wait=False, cancel_futures=True))
+        with executor:
+            futures = {
+                executor.submit(download, job, entry): entry
+                for entry in items
+            }
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry = futures.pop(future)
+                    if future.cancelled():
+                        continue
+                    result = future.result()
+                    if self._requeue(job, entry, result, attempts):
+                        try:
+                            futures[executor.submit(self._retry_item, job, entry, attempts[entry.index], download)] = entry
+                            continue
+                        except RuntimeError:
+                            pass
+                    self._record_item_result(job, entry, result)
+
+    def _requeue(self, job, entry, result, attempts):
+        if not result.error or job.cancelled or is_permanent_error(result.error):
+            return False
+        attempts[entry.index] += 1
+        if attempts[entry.index] >= MAX_ITEM_ATTEMPTS:
+            return False
+        job.emit(
+            "item_retry",
+            index=entry.index,
+            video_id=entry.video_id,
+            attempt=attempts[entry.index] + 1,
+            error=result.error
+        )
+        return True
+
+    def _retry_item(self, job, entry, attempt, download):
+        job._cancelled.wait(RETRY_DELAY * attempt * random.uniform(0.5, 1.5))
+        if job.cancelled:
+            return ItemResult(entry.index, entry.video_id, error="Cancelled")
+        return download(job, entry)
+
+    def _record_item_result(self, job, entry, result):
+        index, video_id = entry.index, entry.video_id
+        if result.error and job.cancelled:
+            return
+        job.completed += 1
+        job.results[index] = result
+        if result.error:
+            job.failures.append(result.error)
+            job.emit("item_failed", index=index, video_id=video_id, error=result.error)
+        else:
+            job.successes.append(result.title)
+            job.completed_duration += entry.duration or 0
+            if result.path:
+                job.output_files.append(result.path)
+            if result.skipped:
+                job.skipped += 1
+            job.emit(
+                "item_done",
+                index=index,
+                video_id=video_id,
+                title=result.title,
+                path=result.path,
+                skipped=result.skipped
+            )
+        job.emit("progress", completed=job.completed, total=job.total)
+
+    def _run_pipeline(self, job, workers, items):
+        workdir = tempfile.mkdtemp(prefix="ytc-")
+        encode_queue = queue.Queue(maxsize=self.transcode_workers * PIPELINE_QUEUE_DEPTH)
+        finish_queue = queue.Queue()
+
+        def fetch(entry):
+            try:
+                result = self._fetch_playlist_item(job, entry, workdir)
+            except Exception as e:
+                result = ItemResult(entry.index, entry.video_id, error=f"ERROR: {e}")
+            if isinstance(result, FetchedSource):
+                encode_queue.put((entry, result))
+            else:
+                finish_queue.put((entry, result))
+
+        def encode():
+            while True:
+                task = encode_queue.get()
+                if task is None:
+                    return
+                entry, source = task
+                try:
+                    result = self._encode_playlist_item(job, entry, source)
+                except Exception as e:
+                    result = ItemResult(entry.index, entry.video_id, error=f"ERROR: {e}")
+                finish_queue.put((entry, result))
+
+        attempts = collections.Counter()
+        encoders = [
+            threading.Thread(target=encode, daemon=True)
+            for _ in range(min(self.transcode_workers, len(items)))
+        ]
+        for encoder in encoders:
+            encoder.start()
+
+        fetchers = ThreadPoolExecutor(max_workers=min(workers, len(items)))
+        job._on_cancel(lambda: fetchers.shutdown(wait=False, cancel_futures=True))
+        try:
+            for entry in items:
+                fetchers.submit(fetch, entry)
+
+            remaining = len(items)
+            while remaining and not job.cancelled:
+                try:
+                    entry, result = finish_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if self._requeue(job, entry, result, attempts):
+                    try:
+                        fetchers.submit(self._retry_item, job, entry, attempts[entry.index], lambda _, item: fetch(item))
+                        continue
+                    except RuntimeError:
+                        pass
+                remaining -= 1
+                self._record_item_result(job, entry, result)
+        finally:
+            fetchers.shutdown(wait=True, cancel_futures=True)
+            for _ in encoders:
+                encode_queue.put(None)
+            for encoder in encoders:
+                encoder.join()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _fetch_playlist_item(self, job, entry, workdir):
+        index, video_id = entry.index, entry.video_id
+        archived = self._archived(job, video_id)
+        if archived:
+            return ItemResult(index, video_id, archived["title"] or entry.title, archived["path"], skipped=True)
+
+        job.emit("item_started", index=index, video_id=video_id, title=entry.title, duration=entry.duration)
+        source = self._fetch_source(
+            job, index, video_id, video_url(video_id), os.path.join(workdir, str(index)), [(job.format, job.quality)]
+        )
+        if source.error is None:
+            return source
+        error = source.error if source.error.startswith("ERROR:") else None
+        return ItemResult(index, video_id, error=error or f"ERROR: item {index} ({video_id}) could not be downloaded")
+
+    def _encode_playlist_item(self, job, entry, source):
+        index, video_id = entry.index, entry.video_id
+        title = source.title or entry.title
+        dest = os.path.join(
+            job.output_dir, f"{index:02d} - {source.stem}.{output_extension(job.format, source.path)}"
+        )
+        try:
+            _, error = self._transcode_target(
+                job, index, video_id, source.path, dest, job.format, job.quality,
+                metadata={"title": title, "track": index}
+            )
+        finally:
+            self._release_source(source)
+        if error:
+            return ItemResult(index, video_id, error=error)
+        if self.archive:
+            self.archive.record(video_id, job.format, job.quality, job.output_dir, dest, title)
+        return ItemResult(index, video_id, title, dest)
+
+    def _fetch_source(self, job, index, video_id, url, workdir, targets):
+        min_bitrate = minimum_source_bitrate(targets)
+        cached = self.source_cache.acquire(video_id, min_bitrate) if self.source_cache and video_id else None
+        if cached:
+            job.emit(
+                "item_progress",
+                progress=ItemProgress(index, video_id, status="finished", filepath=cached["path"])
+            )
+            return FetchedSource(cached["path"], cached["stem"], cached["title"], cached=True)
+
+        cmd = build_source_command(
+            url, os.path.join(workdir, "%(title)s.%(ext)s"), executable=self.backend.executable(), targets=targets
+        )
+        result = self._run_yt_dlp(job, cmd, index, video_id)
+        if job.cancelled:
+            return FetchedSource(error="Cancelled")
+        if result.returncode != 0 or not result.path:
+            return FetchedSource(error=result.error or "Unknown error")
+
+        stem = os.path.splitext(os.path.basename(result.path))[0]
+        if self.source_cache and video_id and result.format_id:
+            path = self.source_cache.store(
+                video_id, result.format_id, result.path, stem, result.title, result.abr, best=min_bitrate is None
+            )
+            return FetchedSource(path, stem, result.title, cached=True)
+        return FetchedSource(result.path, stem, result.title)
+
+    def _release_source(self, source):
+        # Uncached sources are only needed until they are converted; a long playlist would otherwise fill the
+        # temp folder before the pipeline ends.
+        if source.cached:
+            self.source_cache.release(source.path)
+        elif source.path:
+            try:
+                os.remove(source.path)
+            except OSError:
+                pass
+
+    def _run_multi(self, job, filename):
+        try:
+            job.status = "running"
+            job.total = len(job.targets)
+            job.emit("started", total=job.total)
+
+            video_id = extract_video_id(job.url)
+            pending = []
+            for index, (selected_format, quality) in enumerate(job.targets, 1):
+                archived = None
+                if self.archive and video_id:
+                    archived = self.archive.lookup(video_id, selected_format, quality, job.output_dir)
+                archived_stem = os.path.splitext(os.path.basename(archived["path"]))[0] if archived else None
+                if archived and filename and archived_stem not in (filename, filename + ORIGINAL_SUFFIX):
+                    archived = None
+                if archived:
+                    job.completed += 1
+                    job.skipped += 1
+                    job.successes.append(archived["title"] or filename or job.url)
+                    job.output_files.append(archived["path"])
+                    job.emit(
+                        "item_done",
+                        index=index,
+                        video_id=video_id,
+                        title=archived["title"],
+                        path=archived["path"],
+                        format=selected_format,
+                        skipped=True
+                    )
+                else:
+                    pending.append((index, selected_format, quality))
+
+            if len(pending) == 1 and self._streams(pending[0][1]):
+                self._stream_single(job, filename, video_id, *pending[0])
+            elif pending:
+                workdir = tempfile.mkdtemp(prefix="ytc-")
+                try:
+                    self._fetch_and_transcode(job, filename, video_id, pending, workdir)
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+            if job.cancelled:
+                job._finish("cancelled")
+            elif job.failures and job.successes:
+                job._finish("partial", job.failures[0])
+            elif job.failures:
+                job._finish("failed", job.failures[0])
+            else:
+                job._finish("completed")
+        except Exception as e:
+            job._finish("failed", str(e))
+
+    def _fetch_and_transcode(self, job, filename, video_id, pending, workdir):
+        targets = [(selected_format, quality) for _, selected_format, quality in pending]
+        source = self._fetch_source(job, 1, video_id, job.url, workdir, targets)
+        if job.cancelled:
+            self._release_source(source)
+            return
+        if source.error is not None:
+            for index, selected_format, _ in pending:
+                job.completed += 1
+                job.failures.append(source.error)
+                job.emit("item_failed", index=index, video_id=video_id, format=selected_format, error=source.error)
+            return
+
+        try:
+            self._transcode_targets(job, video_id, pending, source.path, filename or source.stem, source.title or filename)
+        finally:
+            self._release_source(source)
+
+    def _transcode_targets(self, job, video_id, pending, source_path, stem, title):
+        os.makedirs(job.output_dir, exist_ok=True)
+
+        executor = ThreadPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1))
+        job._on_cancel(lambda: executor.shutdown(wait=False, cancel_futures=True))
+        with executor:
+            futures = {
+                executor.submit(
+                    self._transcode_target,
+                    job,
+                    index,
+                    video_id,
+                    source_path,
+                    target_path(job.output_dir, stem, selected_format, source_path, job.targets),
+                    selected_format,
+                    quality,
+                    {"title": title}
+                ): (index, selected_format, quality)
+                for index, selected_format, quality in pending
+            }
+
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                index, selected_format, quality = futures[future]
+                dest, error = future.result()
+                self._record_target(job, video_id, index, selected_format, quality, title, dest, error)
+
+    def _record_target(self, job, video_id, index, selected_format, quality, title, dest, error):
+        if error and job.cancelled:
+            return
+        job.completed += 1
+        if error:
+            job.failures.append(error)
+            job.emit("item_failed", index=index, video_id=video_id, format=selected_format, error=error)
+            return
+        job.successes.append(title or job.url)
+        job.output_files.append(dest)
+        if self.archive and video_id:
+            self.archive.record(video_id, selected_format, quality, job.output_dir, dest, title)
+        job.emit(
+            "item_done",
+            index=index,
+            video_id=video_id,
+            title=title,
+            path=dest,
+            format=selected_format
+        )
+
+    def _transcode_target(self, job, index, video_id, source, dest, selected_format, quality, metadata=None):
+        transcode = Transcode(source, dest, selected_format, quality, metadata)
+        job._on_cancel(transcode.cancel)
+        try:
+            postprocessor = "Remux" if transcode.prepare() else "FFmpeg"
+            job.emit(
+                "item_progress",
+                progress=ItemProgress(index, video_id, phase="postprocess", status="started", postprocessor=postprocessor)
+            )
+            return dest, transcode.run()
+        finally:
+            job._remove_cancel_hook(transcode.cancel)
+
+    def _stream_single(self, job, filename, video_id, index, selected_format, quality):
+        os.makedirs(job.output_dir, exist_ok=True)
+        title, dest, error = self._stream_target(job, index, video_id, job.url, selected_format, quality, filename)
+        self._record_target(job, video_id, index, selected_format, quality, title or filename, dest, error)
+
+    def _stream_playlist_item(self, job, entry):
+        index, video_id = entry.index, entry.video_id
+        archived = self._archived(job, video_id)
+        if archived:
+            return ItemResult(index, video_id, archived["title"] or entry.title, archived["path"], skipped=True)
+
+        job.emit("item_started", index=index, video_id=video_id, title=entry.title, duration=entry.duration)
+        title, dest, error = self._stream_target(
+            job, index, video_id, video_url(video_id), job.format, job.quality, prefix=f"{index:02d} - ", track=index
+        )
+        if error is None:
+            if self.archive:
+                self.archive.record(video_id, job.format, job.quality, job.output_dir, dest, title)
+            return ItemResult(index, video_id, title, dest)
+        error = error if error.startswith("ERROR:") else None
+        return ItemResult(index, video_id, error=error or f"ERROR: item {index} ({video_id}) could not be downloaded")
+
+    def _stream_target(self, job, index, video_id, url, selected_format, quality, filename=None, prefix="", track=None):
+        stream = StreamTranscode(selected_format, quality)
+        job._on_cancel(stream.cancel)
+
+        def on_info(stem, info):
+            dest = os.path.join(job.output_dir, f"{prefix}{filename or stem}.{selected_format}")
+            stream.start(dest, {"title": info.get("title"), "track": track}, stream_probe(info))
+            job.emit(
+                "item_progress",
+                progress=ItemProgress(
+                    index, video_id, phase="postprocess", status="started",
+                    postprocessor="Remux" if stream.copy else "FFmpeg"
+                )
+            )
+
+        try:
+            cmd = build_stream_command(url, [(selected_format, quality)], executable=tools.require("yt-dlp"))
+            result = self._run_yt_dlp(
+                job, cmd, index, video_id, spawn=stream.spawn, prints=STREAM_PRINTS, on_info=on_info
+            )
+        finally:
+            stream.kill()
+            job._remove_cancel_hook(stream.cancel)
+        if job.cancelled:
+            return None, None, "Cancelled"
+        if result.returncode != 0 or stream.dest is None:
+            return None, None, stream.error or result.error or "Unknown error"
+        return result.title, stream.dest, None
+
+    def _archived(self, job, video_id):
+        if not self.archive or not video_id:
+            return None
+        return self.archive.lookup(video_id, job.format, job.quality, job.output_dir)
+
+    def _download_playlist_item(self, job, entry):
+        index, video_id = entry.index, entry.video_id
+        archived = self._archived(job, video_id)
+        if archived:
+            return ItemResult(index, video_id, archived["title"] or entry.title, archived["path"], skipped=True)
+
+        job.emit("item_started", index=index, video_id=video_id, title=entry.title, duration=entry.duration)
+
+        output_template = os.path.join(job.output_dir, f"{index:02d} - %(title)s.%(ext)s")
+        cmd = build_yt_dlp_command(
+            video_url(video_id), job.format, job.quality, output_template, executable=self.backend.executable()
+        )
+        result = self._run_yt_dlp(job, cmd, index, video_id)
+
+        if result.returncode == 0 and result.title is not None:
+            if self.archive and result.path:
+                self.archive.record(video_id, job.format, job.quality, job.output_dir, result.path, result.title)
+            return ItemResult(index, video_id, result.title, result.path)
+        error = result.error if result.error and result.error.startswith("ERROR:") else None
+        return ItemResult(index, video_id, error=error or f"ERROR: item {index} ({video_id}) could not be downloaded")
+
+    def _run_yt_dlp(self, job, cmd, index, video_id=None, spawn=None, prints=DOWNLOAD_PRINTS, on_info=None):
+        supports = self.backend.supports if spawn is None else SubprocessBackend().supports
+        spawn = spawn or self.backend.spawn
+        cmd = cmd + ["--newline", "--progress"]
+        if supports("--progress-template"):
+            for template in PROGRESS_TEMPLATES:
+                cmd.extend(["--progress-template", template])
+        fixed_fragments = job.fragments or self.fragments
+        fragments = fixed_fragments or self.fragment_tuner.current()
+        if supports("--concurrent-fragments"):
+            cmd.extend(["--concurrent-fragments", str(fragments)])
+        for template in prints:
+            cmd.extend(["--print", template])
+        title = None
+        path = None
+        format_id = None
+        abr = None
+        stem = None
+        error = None
+        tail = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        downloaded = {}
+        fragmented = False
+        started_at = finished_at = None
+
+        self.controller.wait_backoff(job)
+        with self.slots:
+            sharing = self.slots.active
+            grant, rate = self.bandwidth.acquire(job)
+            if job.cancelled:
+                self.bandwidth.release(grant)
+                return ProcessResult(-1, error="Cancelled")
+            if rate and supports("--limit-rate"):
+                cmd.extend(["--limit-rate", str(rate)])
+            try:
+                process = spawn(cmd)
+            except Exception:
+                self.bandwidth.release(grant)
+                raise
+            if hasattr(process, "set_rate_limit"):
+                self.bandwidth.attach(grant, process.set_rate_limit)
+            job._on_cancel(process.kill)
+            try:
+                for raw_line in process.stdout:
+                    line = raw_line.strip()
+                    if not line:
+                        continue
+
+                    if line.startswith(PROGRESS_PREFIX):
+                        data = _parse_json(line[len(PROGRESS_PREFIX):])
+                        if data is not None:
+                            progress = ItemProgress.from_download(index, video_id, data)
+                            finished_at = time.monotonic()
+                            started_at = started_at or finished_at
+                            if progress.downloaded_bytes is not None:
+                                downloaded[progress.filepath] = progress.downloaded_bytes
+                            fragmented = fragmented or bool(progress.fragment_count)
+                            job.emit("item_progress", progress=progress)
+                    elif line.startswith(POSTPROCESS_PREFIX):
+                        data = _parse_json(line[len(POSTPROCESS_PREFIX):])
+                        if data is not None:
+                            job.emit("item_progress", progress=ItemProgress.from_postprocess(index, video_id, data))
+                    elif line.startswith(DONE_PREFIX):
+                        title = line[len(DONE_PREFIX):].strip()
+                    elif line.startswith(FORMAT_PREFIX):
+                        format_id = line[len(FORMAT_PREFIX):].strip()
+                    elif line.startswith(ABR_PREFIX):
+                        abr = _parse_float(line[len(ABR_PREFIX):])
+                    elif line.startswith(STEM_PREFIX):
+                        stem = line[len(STEM_PREFIX):].strip()
+                    elif line.startswith(INFO_PREFIX):
+                        data = _parse_json(line[len(INFO_PREFIX):])
+                        if data is not None:
+                            title = data.get("title")
+                            format_id = data.get("format_id")
+                            if on_info:
+                                on_info(stem or title, data)
+                    elif line.startswith(FILE_PREFIX):
+                        path = line[len(FILE_PREFIX):].strip()
+                        job.emit(
+                            "item_progress",
+                            progress=ItemProgress(index, video_id, phase="move", status="finished", filepath=path)
+                        )
+                    else:
+                        if error is None and line.startswith("ERROR:"):
+                            error = line
+                        tail.append(line)
+                returncode = process.wait()
+                sharing = (sharing + self.slots.active) / 2
+                limited = bool(rate) or self.bandwidth.rate is not None
+            finally:
+                job._remove_cancel_hook(process.kill)
+                self.bandwidth.release(grant)
+
+        elapsed = finished_at - started_at if started_at is not None else 0
+        if returncode == 0:
+            self.controller.succeeded(sum(downloaded.values()), elapsed, rate, sharing)
+            # Only fragmented downloads that no bandwidth cap held back say anything about the level; direct
+            # HTTPS downloads ignore --concurrent-fragments.
+            if not fixed_fragments and fragmented and not limited and started_at is not None:
+                self.fragment_tuner.record(fragments, sum(downloaded.values()), elapsed)
+        elif not job.cancelled and is_throttle_error("\n".join([error or ""] + list(tail))):
+            self.controller.throttled()
+
+        return ProcessResult(returncode, title, path, error or "\n".join(tail), format_id, stem, abr)
+
+
+def _read_urls(args):
+    urls = list(args.urls)
+    if args.input:
+        stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        with stream:
+            urls.extend(line.strip() for line in stream if line.strip() and not line.startswith("#"))
+    return urls
+
+
+def _print_event(event, job_id=None):
+    job = event.job
+    job_id = job_id or job.id
+    if event.kind == "item_progress" and job.kind != "playlist" and sys.stderr.isatty():
+        print(f"\r[job {job_id}] {describe_progress(event.data['progress'])}\033[K", end="", file=sys.stderr, flush=True)
+    elif event.kind == "enumerating" and event.data["count"] % 100 == 0:
+        print(f"[job {job_id}] listing playlist... {event.data['count']} item(s) found", file=sys.stderr)
+    elif event.kind == "started" and job.kind == "playlist":
+        print(f"[job {job_id}] {job.total} playlist item(s)", file=sys.stderr)
+    elif event.kind == "item_done":
+        if job.kind != "playlist" and sys.stderr.isatty():
+            print(file=sys.stderr)
+        label = event.data.get("path") or event.data.get("title") or job.url
+        state = "archived" if event.data.get("skipped") else "done"
+        print(f"[job {job_id}] {state} {job.completed}/{job.total}: {label}", file=sys.stderr)
+    elif event.kind == "item_retry":
+        print(
+            f"[job {job_id}] retrying item {event.data['index']} (attempt {event.data['attempt']}/{MAX_ITEM_ATTEMPTS}): "
+            f"{event.data['error'].strip().splitlines()[-1]}",
+            file=sys.stderr
+        )
+    elif event.kind == "item_failed":
+        print(f"[job {job_id}] failed item {event.data['index']}: {event.data['error'].strip()}", file=sys.stderr)
+
+
+def _build_engine(args):
+    archive = None
+    if not args.no_archive:
+        from download_archive import DownloadArchive
+        archive = DownloadArchive()
+    source_cache = None
+    if not args.no_source_cache:
+        source_cache = _open_source_cache(args)
+    workers = max(1, args.workers)
+    backend = create_backend(args.backend, workers)
+    return ConverterEngine(
+        workers=workers,
+        max_downloads=workers,
+        archive=archive,
+        backend=backend,
+        source_cache=source_cache,
+        transcode_workers=args.transcode_workers,
+        stream=args.stream,
+        fragments=args.fragments,
+        rate_limit=_stored_rate_limit(args)
+    )
+
+
+def _stored_rate_limit(args):
+    from job_queue import RATE_LIMIT_SETTING, JobStore
+
+    store = JobStore(args.queue_db)
+    try:
+        return parse_rate(store.get_setting(RATE_LIMIT_SETTING))
+    except ValueError:
+        return None
+    finally:
+        store.close()
+
+
+def _set_rate_limit(args, rate):
+    from job_queue import RATE_LIMIT_SETTING, JobStore
+
+    store = JobStore(args.queue_db)
+    store.set_setting(RATE_LIMIT_SETTING, rate or 0)
+    store.close()
+    print(f"Bandwidth limit: {format_rate(rate)}", file=sys.stderr)
+
+
+def _open_source_cache(args):
+    from source_cache import SourceCache
+    if args.cache_size is None:
+        return SourceCache()
+    return SourceCache(max_bytes=args.cache_size * 1024 * 1024)
+
+
+def _run_cache_command(args):
+    from source_cache import describe_cache_stats
+
+    cache = _open_source_cache(args)
+    if args.clear_cache:
+        cache.clear()
+        print("Source cache cleared")
+    stats = cache.stats()
+    print(describe_cache_stats(stats))
+    print(f"{stats['evictions']} eviction(s); cache folder: {cache.directory}")
+    cache.close()
+    return 0
+
+
+def _print_queue(store):
+    for row in reversed(store.list_jobs()):
+        progress = f"{row['done_items']}/{row['total_items']}" if row["kind"] == "playlist" else ""
+        failed = f"{row['failed_items']} failed" if row["failed_items"] else ""
+        print(f"{row['id']:>5}  {row['status']:<9}  {row['kind']:<8}  {progress:>9}  {failed:>10}  {row['url']}")
+
+
+def _print_failed_items(job_id, items):
+    for item in items:
+        error = (item["error"] or "unknown error").strip().splitlines()[-1]
+        print(f"[job {job_id}] item {item['idx']} ({item['video_id']}): {error}", file=sys.stderr)
+
+
+def _retry_failed_jobs(store, job_ids):
+    if not job_ids:
+        job_ids = [row["id"] for row in reversed(store.retryable_jobs())]
+        if not job_ids:
+            print("No failed jobs to retry")
+    for job_id in job_ids:
+        items = store.get_items(job_id, "failed")
+        if not store.retry_failed(job_id):
+            row = store.get_job(job_id)
+            status = row["status"] if row else "not found"
+            print(f"Job {job_id} cannot be retried ({status})", file=sys.stderr)
+        elif items:
+            _print_failed_items(job_id, items)
+            print(f"Queued job {job_id} again: retrying {len(items)} failed item(s)")
+        else:
+            print(f"Queued job {job_id} again")
+
+
+def _print_tools():
+    for info in tools.report():
+        if info.path is None:
+            print(f"{info.name:<8}  not found")
+            continue
+        capabilities = ", ".join(info.capabilities or [])
+        print(f"{info.name:<8}  {info.version or 'unknown':<12}  {info.path} ({info.source})  {capabilities}")
+
+
+def _run_queue_command(args, urls, targets):
+    from job_queue import JobScheduler, JobStore
+
+    store = JobStore(args.queue_db)
+    if args.list_queue:
+        _print_queue(store)
+        return 0
+    if args.retry_failed is not None:
+        _retry_failed_jobs(store, args.retry_failed)
+
+    if args.playlist:
+        kind = "playlist"
+    else:
+        kind = "multi" if len(targets) > 1 else "single"
+    selected_format, quality = format_targets(targets)
+    for url in urls:
+        job_id = store.add_job(kind, url, os.path.abspath(args.output), selected_format, quality, args.name)
+        print(f"Queued job {job_id}: {url}")
+
+    if not args.run_queue:
+        return 0
+
+    finished = set()
+
+    def listener(job_id, event):
+        _print_event(event, job_id)
+        if event.kind == "finished":
+            finished.add(job_id)
+
+    engine = _build_engine(args)
+    scheduler = JobScheduler(store, engine, concurrency=max(1, args.workers), listener=listener).start()
+    scheduler.wait_idle()
+    scheduler.stop()
+    engine.close()
+    _print_queue(store)
+    statuses = [store.get_job(job_id)["status"] for job_id in finished]
+    return 0 if all(status == "completed" for status in statuses) else 1
+
+
+def _queue_command(args):
+    return args.run_queue or args.list_queue or args.retry_failed is not None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="converter_engine",
+        description="Download and convert YouTube videos and playlists without the GUI."
+    )
+    parser.add_argument("urls", nargs="*", help="YouTube video or playlist URLs")
+    parser.add_argument("-i", "--input", help="read URLs from a file, one per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default=".", help="output folder (default: current directory)")
+    parser.add_argument("-f", "--format", default="mp3",
+                        help=f"output format ({', '.join(QUALITY_OPTIONS)}), or a comma-separated list of audio "
+                             "formats such as 'mp3,wav' to download once and convert to each")
+    parser.add_argument("-q", "--quality",
+                        help="quality, e.g. '320', '24-bit' or '1080p' (default: lowest option); "
+                             "comma-separated in the same order when several formats are given")
+    parser.add_argument("-n", "--name", help="output filename for a single video (default: YouTube title)")
+    parser.add_argument("-p", "--playlist", action="store_true", help="treat the URLs as playlists")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_PLAYLIST_WORKERS,
+                        help="parallel downloads (playlist workers and queue concurrency)")
+    parser.add_argument("-t", "--transcode-workers", type=int, default=DEFAULT_TRANSCODE_WORKERS,
+                        help="parallel ffmpeg encodes for audio playlists (default: CPU cores)")
+    parser.add_argument("-N", "--fragments", type=int, metavar="N",
+                        help="download N fragments of each DASH/HLS item at once (default: tuned automatically "
+                             "from measured throughput)")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="convert again even if the download archive has the item")
+    parser.add_argument("--enqueue", action="store_true", help="add the URLs to the persistent job queue")
+    parser.add_argument("--run-queue", action="store_true", help="run queued jobs, resuming unfinished ones")
+    parser.add_argument("--list-queue", action="store_true", help="show the persistent job queue")
+    parser.add_argument("--retry-failed", nargs="*", type=int, metavar="JOB_ID",
+                        help="queue only the failed items of these failed or partial jobs again, keeping their "
+                             "playlist indices (default: every failed job); add --run-queue to run them")
+    parser.add_argument("--queue-db", help="job queue database (default: app data folder)")
+    parser.add_argument("--no-source-cache", action="store_true",
+                        help="do not keep downloaded audio sources for later re-conversions")
+    parser.add_argument("--cache-size", type=int, metavar="MB",
+                        help="source cache size limit in MB (default: YTC_SOURCE_CACHE_MB or 2048)")
+    parser.add_argument("--limit-rate", metavar="RATE",
+                        help="cap the total download bandwidth shared by all workers, e.g. 500K or 2M (0 removes "
+                             "the cap); saved, and picked up within a second by the GUI and running queues")
+    parser.add_argument("--stream", action="store_true", default=DEFAULT_STREAM,
+                        help="pipe single-format audio downloads straight into ffmpeg instead of saving the "
+                             "source first (default from YTC_STREAM=1)")
+    parser.add_argument("--cache-stats", action="store_true", help="show source cache size and hit rate")
+    parser.add_argument("--clear-cache", action="store_true", help="delete all cached sources")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS,
+                        help="run yt-dlp as a subprocess per item, or in a pool of warm Python workers "
+                             "(needs the yt_dlp package; default from YTC_BACKEND or 'subprocess')")
+    parser.add_argument("--list-tools", action="store_true",
+                        help="show the resolved yt-dlp, ffmpeg and ffprobe binaries and their versions")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.list_tools:
+        _print_tools()
+        return 0
+    if args.cache_stats or args.clear_cache:
+        return _run_cache_command(args)
+
+    urls = _read_urls(args)
+    if args.limit_rate is not None:
+        try:
+            rate = parse_rate(args.limit_rate)
+        except ValueError as e:
+            parser.error(str(e))
+        _set_rate_limit(args, rate)
+        if not urls and not _queue_command(args):
+            return 0
+    if not urls and not _queue_command(args):
+        parser.error("no URLs given")
+
+    try:
+        targets = parse_targets(args.format, args.quality)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(targets) > 1 and args.playlist:
+        parser.error("several formats can only be combined for single videos")
+    selected_format, quality = targets[0]
+
+    if args.fragments is not None and args.fragments < 1:
+        parser.error("--fragments must be at least 1")
+    if args.backend == "pool" and not pool_available():
+        parser.error("--backend pool needs the yt_dlp Python package (pip install yt-dlp)")
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.enqueue or _queue_command(args):
+        return _run_queue_command(args, urls, targets)
+
+    engine = _build_engine(args)
+    exit_code = 0
+
+    for url in urls:
+        if args.playlist:
+            if not is_playlist_url(url):
+                print(f"Skipping {url}: playlist URL must include a list= parameter", file=sys.stderr)
+                exit_code = 1
+                continue
+            job = engine.convert_playlist(url, args.output, selected_format, quality, listener=_print_event)
+        elif len(targets) > 1:
+            job = engine.convert_formats(url, args.output, args.name, targets, listener=_print_event)
+        else:
+            job = engine.convert(url, args.output, args.name, selected_format, quality, listener=_print_event)
+
+        try:
+            job.wait()
+        except KeyboardInterrupt:
+            job.cancel()
+            job.wait()
+            print(f"[job {job.id}] cancelled", file=sys.stderr)
+            return 130
+        skipped = f" ({job.skipped} already in archive)" if job.skipped else ""
+        if job.status == "completed":
+            print(f"[job {job.id}] complete: {len(job.successes)} converted{skipped}")
+        else:
+            exit_code = 1
+            print(f"[job {job.id}] {job.status}: {len(job.successes)} converted{skipped}, {len(job.failures)} failed")
+            failed = job.failed_entries()
+            if failed:
+                print(
+                    f"[job {job.id}] failed items: {', '.join(str(entry.index) for entry in failed)} "
+                    "(queue the playlist with --enqueue to retry just these later with --retry-failed)",
+                    file=sys.stderr
+                )
+            elif job.error:
+                print(job.error.strip(), file=sys.stderr)
+
+    engine.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    # job_queue, source_cache and download_archive import this module by name; point them at the running copy
+    # instead of loading (and initialising) a second one.
+    sys.modules.setdefault("converter_engine", sys.modules[__name__])
+    sys.exit(main())
@@ -0,0 +1,441 @@
+import os
+import sqlite3
+import threading
+import time
+
+from app_support import app_data_dir
+from converter_engine import (
+    DEFAULT_PLAYLIST_WORKERS,
+    ConverterEngine,
+    PlaylistEntry,
+    parse_rate,
+    parse_targets
+)
+
+QUEUE_DB_NAME = "queue.sqlite3"
+ACTIVE_STATUSES = ("pending", "running")
+RETRYABLE_STATUSES = ("failed", "partial")
+RATE_LIMIT_SETTING = "rate_limit"
+# A running job belongs to the process that claimed it for as long as that process keeps renewing its lease.
+LEASE_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    filename TEXT,
+    format TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    output_file TEXT,
+    error TEXT,
+    owner INTEGER,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    title TEXT,
+    duration REAL,
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def default_queue_path():
+    return os.path.join(app_data_dir(), QUEUE_DB_NAME)
+
+
+class JobStore:
+    def __init__(self, path=None):
+        self.path = path or default_queue_path()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(items)")}
+        if "duration" not in columns:
+            self._conn.execute("ALTER TABLE items ADD COLUMN duration REAL")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def get_setting(self, name, default=None):
+        rows = self._query("SELECT value FROM settings WHERE name = ?", (name,))
+        return rows[0]["value"] if rows else default
+
+    def set_setting(self, name, value):
+        self._execute(
+            "INSERT INTO settings (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, None if value is None else str(value))
+        )
+
+    def add_job(self, kind, url, output_dir, selected_format, quality, filename=None):
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO jobs (kind, url, output_dir, filename, format, quality, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, url, output_dir, filename, selected_format, quality, now, now)
+        )
+        return cursor.lastrowid
+
+    def get_job(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def list_jobs(self, limit=None):
+        sql = (
+            "SELECT jobs.*, COUNT(items.idx) AS total_items, "
+            "COALESCE(SUM(items.status = 'done'), 0) AS done_items, "
+            "COALESCE(SUM(items.status = 'failed'), 0) AS failed_items "
+            "FROM jobs LEFT JOIN items ON items.job_id = jobs.id "
+            "GROUP BY jobs.id ORDER BY jobs.id DESC"
+        )
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._query(sql)
+
+    def next_pending(self, exclude=()):
+        placeholders = ",".join("?" for _ in exclude)
+        sql = "SELECT * FROM jobs WHERE status = 'pending'"
+        if exclude:
+            sql += f" AND id NOT IN ({placeholders})"
+        rows = self._query(sql + " ORDER BY id LIMIT 1", tuple(exclude))
+        return rows[0] if rows else None
+
+    def claim_next(self, owner, exclude=()):
+        # Another process may claim the same row between the lookup and the update; only one update wins.
+        while True:
+            row = self.next_pending(exclude)
+            if not row:
+                return None
+            now = time.time()
+            cursor = self._execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'pending'",
+                (owner, now, now, row["id"])
+            )
+            if cursor.rowcount:
+                return self.get_job(row["id"])
+
+    def renew_leases(self, owner):
+        self._execute(
+            "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'", (time.time(), owner)
+        )
+
+    def count_active(self):
+        rows = self._query(
+            "SELECT COUNT(*) AS n FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+        )
+        return rows[0]["n"]
+
+    def set_job_status(self, job_id, status, error=None, output_file=None):
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, output_file = COALESCE(?, output_file), updated_at = ? "
+            "WHERE id = ?",
+            (status, error, output_file, time.time(), job_id)
+        )
+
+    def reset_interrupted(self, owner=None):
+        # Only jobs whose owner has exited or stopped renewing its lease go back to pending; jobs that
+        # another live process (the GUI or a --run-queue) is converting are left alone.
+        stale = time.time() - LEASE_TIMEOUT
+        abandoned = [
+            row["id"]
+            for row in self._query("SELECT id, owner, heartbeat FROM jobs WHERE status = 'running'")
+            if row["owner"] is None
+            or row["owner"] == owner
+            or (row["heartbeat"] or 0) < stale
+            or not _process_alive(row["owner"])
+        ]
+        for job_id in abandoned:
+            self._execute(
+                "UPDATE jobs SET status = 'pending', owner = NULL, heartbeat = NULL WHERE id = ? AND status = 'running'",
+                (job_id,)
+            )
+        return abandoned
+
+    def retry_failed(self, job_id):
+        # Failed playlist items go back to pending; the scheduler resumes a playlist from its pending items,
+        # so done items are left alone and retried ones keep their original indices.
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'pending', error = NULL, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (time.time(), job_id, *RETRYABLE_STATUSES)
+            )
+            if not cursor.rowcount:
+                return False
+            self._conn.execute(
+                "UPDATE items SET status = 'pending', error = NULL WHERE job_id = ? AND status = 'failed'", (job_id,)
+            )
+        return True
+
+    def retryable_jobs(self):
+        return [row for row in self.list_jobs() if row["status"] in RETRYABLE_STATUSES]
+
+    def clear_finished(self):
+        self._execute("DELETE FROM jobs WHERE status NOT IN (?, ?)", ACTIVE_STATUSES)
+
+    def has_items(self, job_id):
+        return bool(self._query("SELECT 1 FROM items WHERE job_id = ? LIMIT 1", (job_id,)))
+
+    def set_items(self, job_id, entries):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items (job_id, idx, video_id, title, duration) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, entry.index, entry.video_id, entry.title, entry.duration) for entry in entries]
+            )
+
+    def get_entries(self, job_id, status=None):
+        return [
+            PlaylistEntry(item["idx"], item["video_id"], item["title"], item["duration"])
+            for item in self.get_items(job_id, status)
+        ]
+
+    def get_items(self, job_id, status=None):
+        if status:
+            return self._query(
+                "SELECT * FROM items WHERE job_id = ? AND status = ? ORDER BY idx", (job_id, status)
+            )
+        return self._query("SELECT * FROM items WHERE job_id = ? ORDER BY idx", (job_id,))
+
+    def mark_item(self, job_id, index, status, title=None, error=None):
+        self._execute(
+            "UPDATE items SET status = ?, title = COALESCE(?, title), error = ? WHERE job_id = ? AND idx = ?",
+            (status, title, error, job_id, index)
+        )
+
+
+class JobScheduler:
+    def __init__(self, store, engine=None, concurrency=DEFAULT_PLAYLIST_WORKERS, listener=None):
+        self.store = store
+        self.engine = engine or ConverterEngine(workers=concurrency, max_downloads=concurrency)
+        self.concurrency = concurrency
+        self.listener = listener
+        self.rate_limit = None
+        self.owner = os.getpid()
+        self._running = set()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.store.reset_interrupted(self.owner)
+        self._sync_settings()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def submit(self, kind, url, output_dir, selected_format, quality, filename=None):
+        job_id = self.store.add_job(kind, url, output_dir, selected_format, quality, filename)
+        self._idle.clear()
+        self._wakeup.set()
+        return job_id
+
+    def set_concurrency(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        self.engine.workers = self.concurrency
+        self.engine.controller.set_ceiling(self.concurrency)
+        self._wakeup.set()
+
+    def set_rate_limit(self, rate):
+        self.store.set_setting(RATE_LIMIT_SETTING, rate or 0)
+        self._sync_settings()
+
+    def _sync_settings(self):
+        # Other processes (the CLI or another window) may change the limit while jobs run.
+        try:
+            rate = parse_rate(self.store.get_setting(RATE_LIMIT_SETTING))
+        except ValueError:
+            rate = None
+        if rate != self.rate_limit:
+            self.rate_limit = rate
+            self.engine.bandwidth.set_rate(rate)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+            return True
+        row = self.store.get_job(job_id)
+        if row and row["status"] == "pending":
+            self.store.set_job_status(job_id, "cancelled")
+            return True
+        return False
+
+    def retry_failed(self, job_id):
+        with self._lock:
+            if job_id in self._running or not self.store.retry_failed(job_id):
+                return False
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    def running_jobs(self):
+        with self._lock:
+            return set(self._running)
+
+    def wait_idle(self, timeout=None):
+        return self._idle.wait(timeout)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            self._sync_settings()
+            with self._lock:
+                self.store.renew_leases(self.owner)
+                self.store.reset_interrupted()
+            while True:
+                with self._lock:
+                    if len(self._running) >= self.concurrency:
+                        break
+                    row = self.store.claim_next(self.owner, exclude=self._running)
+                    if not row:
+                        break
+                    self._running.add(row["id"])
+                self._launch(row)
+
+            with self._lock:
+                if not self._running and not self.store.next_pending():
+                    self._idle.set()
+            self._wakeup.wait(1.0)
+
+    def _launch(self, row):
+        job_id = row["id"]
+
+        def listener(event):
+            self._on_event(job_id, event)
+
+        try:
+            if row["kind"] == "playlist":
+                items = None
+                if self.store.has_items(job_id):
+                    items = self.store.get_entries(job_id, "pending")
+                    if not items:
+                        self._complete(job_id, None)
+                        return
+                job = self.engine.convert_playlist(
+                    row["url"],
+                    row["output_dir"],
+                    row["format"],
+                    row["quality"],
+                    items=items,
+                    listener=listener
+                )
+            elif row["kind"] == "multi":
+                job = self.engine.convert_formats(
+                    row["url"],
+                    row["output_dir"],
+                    row["filename"],
+                    parse_targets(row["format"], row["quality"]),
+                    listener=listener
+                )
+            else:
+                job = self.engine.convert(
+                    row["url"],
+                    row["output_dir"],
+                    row["filename"],
+                    row["format"],
+                    row["quality"],
+                    listener=listener
+                )
+            with self._lock:
+                if job_id in self._running:
+                    self._jobs[job_id] = job
+        except Exception as e:
+            self.store.set_job_status(job_id, "failed", str(e))
+            self._release(job_id)
+
+    def _on_event(self, job_id, event):
+        if event.kind == "started" and event.data.get("items") and not self.store.has_items(job_id):
+            self.store.set_items(job_id, event.data["items"])
+        elif event.kind == "item_done" and event.job.kind == "playlist":
+            self.store.mark_item(job_id, event.data["index"], "done", title=event.data.get("title"))
+        elif event.kind == "item_failed" and event.job.kind == "playlist":
+            self.store.mark_item(job_id, event.data["index"], "failed", error=event.data.get("error"))
+        elif event.kind == "finished":
+            self._complete(job_id, event.job)
+
+        if self.listener:
+            self.listener(job_id, event)
+
+    def _complete(self, job_id, job):
+        if job is not None and job.status == "cancelled":
+            self.store.set_job_status(job_id, "cancelled")
+        elif job is not None and job.kind != "playlist":
+            output_file = job.output_files[0] if job.output_files else None
+            self.store.set_job_status(job_id, job.status, job.error, output_file)
+        elif self.store.has_items(job_id):
+            items = self.store.get_items(job_id)
+            done = sum(1 for item in items if item["status"] == "done")
+            failed = [item for item in items if item["status"] == "failed"]
+            pending = sum(1 for item in items if item["status"] == "pending")
+            # An engine error after listing (no output folder, ffmpeg missing) leaves items pending; the job
+            # must end failed or partial so Retry Failed can run them.
+            if failed or pending or (job is not None and job.status == "failed"):
+                status = "partial" if done else "failed"
+                error = (job.error if job is not None else None) or (
+                    failed[0]["error"] if failed else f"{pending} item(s) were not converted."
+                )
+            else:
+                status, error = "completed", None
+            self.store.set_job_status(job_id, status, error)
+        else:
+            self.store.set_job_status(job_id, "failed", job.error if job else "No playlist items were found.")
+        self._release(job_id)
+
+    def _release(self, job_id):
+        with self._lock:
+            self._running.discard(job_id)
+            self._jobs.pop(job_id, None)
+        self._wakeup.set()
@@ -0,0 +1,179 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from app_support import app_data_dir, format_bytes
+
+SOURCE_CACHE_DIR = "sources"
+SOURCE_CACHE_DB_NAME = "sources.sqlite3"
+DEFAULT_CACHE_MB = int(os.environ.get("YTC_SOURCE_CACHE_MB", "2048"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    video_id TEXT NOT NULL,
+    format_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stem TEXT NOT NULL,
+    title TEXT,
+    abr REAL,
+    best INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (video_id, format_id)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def default_cache_dir():
+    return os.path.join(app_data_dir(), SOURCE_CACHE_DIR)
+
+
+class SourceCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, SOURCE_CACHE_DB_NAME), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(sources)")}
+        if "abr" not in columns:
+            self._conn.execute("ALTER TABLE sources ADD COLUMN abr REAL")
+            self._conn.execute("ALTER TABLE sources ADD COLUMN best INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self, name):
+        self._conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def acquire(self, video_id, min_bitrate=None):
+        # Sources are downloaded no better than their targets needed, so an entry is only reused when it was
+        # the best stream (required when min_bitrate is None) or its bitrate meets min_bitrate.
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT * FROM sources WHERE video_id = ? ORDER BY last_used DESC", (video_id,)
+            ).fetchall()
+            for row in rows:
+                if not _meets(row, min_bitrate):
+                    continue
+                try:
+                    valid = os.path.getsize(row["path"]) == row["size"]
+                except OSError:
+                    valid = False
+                if not valid:
+                    self._delete(row)
+                    continue
+                self._conn.execute(
+                    "UPDATE sources SET last_used = ? WHERE video_id = ? AND format_id = ?",
+                    (time.time(), row["video_id"], row["format_id"])
+                )
+                self._count("hits")
+                self._pinned[row["path"]] = self._pinned.get(row["path"], 0) + 1
+                return dict(row)
+            self._count("misses")
+        return None
+
+    def store(self, video_id, format_id, source_path, stem, title=None, abr=None, best=False):
+        ext = os.path.splitext(source_path)[1]
+        path = os.path.join(self.directory, f"{video_id}-{format_id}{ext}")
+        shutil.move(source_path, path)
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources "
+                "(video_id, format_id, path, size, stem, title, abr, best, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, format_id, path, size, stem, title, abr, int(best), now, now)
+            )
+            self._pinned[path] = self._pinned.get(path, 0) + 1
+            self._evict()
+        return path
+
+    def release(self, path):
+        with self._lock, self._conn:
+            count = self._pinned.get(path, 0) - 1
+            if count > 0:
+                self._pinned[path] = count
+            else:
+                self._pinned.pop(path, None)
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM sources").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self._conn.execute("SELECT * FROM sources ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            if row["path"] in self._pinned:
+                continue
+            self._delete(row)
+            self._count("evictions")
+            total -= row["size"]
+
+    def _delete(self, row):
+        try:
+            os.remove(row["path"])
+        except OSError:
+            pass
+        self._conn.execute(
+            "DELETE FROM sources WHERE video_id = ? AND format_id = ?", (row["video_id"], row["format_id"])
+        )
+
+    def clear(self):
+        with self._lock, self._conn:
+            for row in self._conn.execute("SELECT * FROM sources").fetchall():
+                if row["path"] not in self._pinned:
+                    self._delete(row)
+            self._conn.execute("DELETE FROM stats")
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sources").fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "size": size,
+            "max_size": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / lookups if lookups else None
+        }
+
+
+def _meets(row, min_bitrate):
+    if row["best"]:
+        return True
+    return min_bitrate is not None and row["abr"] is not None and row["abr"] >= min_bitrate
+
+
+def describe_cache_stats(stats):
+    rate = "n/a" if stats["hit_rate"] is None else f"{stats['hit_rate']:.0%}"
+    lookups = stats["hits"] + stats["misses"]
+    return (
+        f"Source cache: {stats['entries']} file(s), {format_bytes(stats['size'])} of "
+        f"{format_bytes(stats['max_size'])}, hit rate {rate} ({stats['hits']}/{lookups})"
+    )
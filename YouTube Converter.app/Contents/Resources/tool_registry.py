@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+from app_support import app_data_dir
+
+TOOL_CACHE_NAME = "tools.json"
+HOMEBREW_BIN = "/opt/homebrew/bin"
+SEARCH_DIRS = [HOMEBREW_BIN, "/usr/local/bin"]
+PROBE_TIMEOUT = 30
+
+TOOL_ENV_VARS = {
+    "yt-dlp": "YTC_YTDLP",
+    "ffmpeg": "YTC_FFMPEG",
+    "ffprobe": "YTC_FFPROBE",
+    "brew": "YTC_BREW"
+}
+
+YTDLP_CAPABILITIES = ["--lazy-playlist", "--progress-template", "--concurrent-fragments", "--limit-rate"]
+FFMPEG_CAPABILITIES = ["libmp3lame", "aac", "libfdk_aac", "pcm_s16le", "pcm_s24le", "libopus"]
+
+
+class ToolNotFoundError(FileNotFoundError):
+    def __init__(self, name):
+        super().__init__(f"{name} was not found. Install it or set {TOOL_ENV_VARS[name]} to its path.")
+        self.name = name
+
+
+class ToolInfo:
+    def __init__(self, name, path, source, version=None, capabilities=None):
+        self.name = name
+        self.path = path
+        self.source = source
+        self.version = version
+        self.capabilities = capabilities
+
+    def supports(self, capability):
+        return self.capabilities is None or capability in self.capabilities
+
+    def __repr__(self):
+        return f"ToolInfo({self.name!r}, {self.path!r}, {self.version!r})"
+
+
+def default_tool_cache_path():
+    return os.path.join(app_data_dir(), TOOL_CACHE_NAME)
+
+
+def _is_executable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+def _run(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    return result.stdout if result.returncode == 0 else None
+
+
+def _probe_ytdlp(path):
+    version = _run([path, "--version"])
+    help_text = _run([path, "--help"])
+    capabilities = None
+    if help_text is not None:
+        capabilities = [flag for flag in YTDLP_CAPABILITIES if flag in help_text]
+    return (version.strip() if version else None), capabilities
+
+
+def _ffmpeg_version(path):
+    output = _run([path, "-version"])
+    if not output:
+        return None
+    first_line = output.split("\n")[0].split(" ")
+    return first_line[2] if len(first_line) > 2 else "Unknown"
+
+
+def _probe_ffmpeg(path):
+    encoders = _run([path, "-hide_banner", "-encoders"])
+    capabilities = None
+    if encoders is not None:
+        names = {line.split()[1] for line in encoders.splitlines() if len(line.split()) > 1}
+        capabilities = [name for name in FFMPEG_CAPABILITIES if name in names]
+    return _ffmpeg_version(path), capabilities
+
+
+def _probe_ffprobe(path):
+    return _ffmpeg_version(path), []
+
+
+def _probe_brew(path):
+    output = _run([path, "--version"])
+    parts = output.split("\n")[0].split(" ") if output else []
+    return (parts[1] if len(parts) > 1 else None), []
+
+
+PROBES = {
+    "yt-dlp": _probe_ytdlp,
+    "ffmpeg": _probe_ffmpeg,
+    "ffprobe": _probe_ffprobe,
+    "brew": _probe_brew
+}
+
+
+class ToolRegistry:
+    def __init__(self, cache_path=None, search_dirs=None):
+        self.cache_path = cache_path
+        self.search_dirs = SEARCH_DIRS if search_dirs is None else search_dirs
+        self._paths = {}
+        self._infos = {}
+        self._cache = None
+        self._lock = threading.RLock()
+        self._probe_lock = threading.Lock()
+
+    def _cache_file(self):
+        if self.cache_path is None:
+            self.cache_path = default_tool_cache_path()
+        return self.cache_path
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self._cache_file(), encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+            if not isinstance(cache, dict):
+                cache = {}
+            cache.setdefault("paths", {})
+            cache.setdefault("probes", {})
+            self._cache = cache
+        return self._cache
+
+    def _save_cache(self):
+        path = self._cache_file()
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self._cache, f, indent=2)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    def _locate(self, name):
+        env_path = os.environ.get(TOOL_ENV_VARS[name])
+        if env_path:
+            return (os.path.abspath(env_path), "env") if _is_executable(env_path) else (None, None)
+
+        configured = self._load_cache()["paths"].get(name)
+        if _is_executable(configured):
+            return configured, "config"
+
+        for directory in self.search_dirs:
+            candidate = os.path.join(directory, name)
+            if _is_executable(candidate):
+                return candidate, "search"
+
+        found = shutil.which(name)
+        return (os.path.abspath(found), "PATH") if found else (None, None)
+
+    def _resolve(self, name):
+        with self._lock:
+            if name not in self._paths:
+                self._paths[name] = self._locate(name)
+            return self._paths[name]
+
+    def path(self, name):
+        return self._resolve(name)[0]
+
+    def require(self, name):
+        path = self.path(name)
+        if path is None:
+            raise ToolNotFoundError(name)
+        return path
+
+    def available(self, name):
+        return self.path(name) is not None
+
+    def info(self, name):
+        path, source = self._resolve(name)
+        if path is None:
+            return None
+        with self._probe_lock:
+            info = self._infos.get(name)
+            if info is not None and info.path == path:
+                return info
+
+            signature = _signature(path)
+            with self._lock:
+                entry = self._load_cache()["probes"].get(path)
+            if not entry or entry.get("signature") != signature:
+                try:
+                    version, capabilities = PROBES[name](path)
+                except (OSError, subprocess.SubprocessError):
+                    version, capabilities = None, None
+                entry = {"signature": signature, "version": version, "capabilities": capabilities}
+                with self._lock:
+                    self._load_cache()["probes"][path] = entry
+                    self._save_cache()
+
+            info = ToolInfo(name, path, source, entry.get("version"), entry.get("capabilities"))
+            self._infos[name] = info
+            return info
+
+    def version(self, name):
+        info = self.info(name)
+        if info is None:
+            return "Not installed"
+        return info.version or "Unknown"
+
+    def supports(self, name, capability):
+        info = self.info(name)
+        return info is not None and info.supports(capability)
+
+    def configure(self, name, path):
+        with self._lock:
+            paths = self._load_cache()["paths"]
+            if path:
+                paths[name] = os.path.abspath(path)
+            else:
+                paths.pop(name, None)
+            self._save_cache()
+            self.refresh(name)
+
+    def refresh(self, name=None):
+        with self._lock:
+            names = [name] if name else list(TOOL_ENV_VARS)
+            for tool in names:
+                self._paths.pop(tool, None)
+                self._infos.pop(tool, None)
+            self._cache = None
+
+    def report(self):
+        return [self.info(name) or ToolInfo(name, None, None) for name in TOOL_ENV_VARS]
+
+
+tools = ToolRegistry()
@@ -0,0 +1,277 @@
+import collections
+import io
+import json
+import os
+import re
+import subprocess
+import threading
+
+from tool_registry import tools
+
+AUDIO_QUALITY_LEVELS = {"320": 0, "256": 1, "192": 2}
+DEFAULT_AUDIO_QUALITY_LEVEL = 4
+WAV_CODECS = {"Lossless (16-bit)": "pcm_s16le", "Lossless (24-bit)": "pcm_s24le"}
+ORIGINAL_FORMAT = "original"
+COPY_CODECS = {"mp3": "mp3", "m4a": "aac"}
+BITRATE_TOLERANCE = 0.95
+PROBE_TIMEOUT = 30
+
+
+def audio_quality_level(quality):
+    for bitrate, level in AUDIO_QUALITY_LEVELS.items():
+        if bitrate in quality:
+            return level
+    return DEFAULT_AUDIO_QUALITY_LEVEL
+
+
+def requested_bitrate(quality):
+    match = re.search(r"(\d+)\s*kbps", quality or "")
+    return int(match.group(1)) if match else None
+
+
+def minimum_source_bitrate(targets):
+    # None when the targets need the best stream there is: lossless, original, or no targets at all.
+    bitrates = [requested_bitrate(quality) for _, quality in targets]
+    if not targets or None in bitrates:
+        return None
+    return int(max(bitrates) * BITRATE_TOLERANCE)
+
+
+def source_format_args(targets):
+    # Lossless and original targets get the best stream; bitrate targets get the smallest one that is
+    # still good enough for all of them, preferring AAC that can be remuxed when every target is M4A.
+    minimum = minimum_source_bitrate(targets)
+    if minimum is None:
+        return ["-f", "bestaudio/best"]
+
+    selectors = [f"worstaudio[abr>={minimum}]", "bestaudio", "best"]
+    if all(fmt == "m4a" for fmt, _ in targets):
+        selectors.insert(0, f"worstaudio[acodec^=mp4a][abr>={minimum}]")
+    return ["-S", "abr", "-f", "/".join(selectors)]
+
+
+def probe_audio(path):
+    ffprobe = tools.path("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [
+                ffprobe, "-v", "error", "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name,bit_rate:format=bit_rate", "-of", "json", path
+            ],
+            capture_output=True,
+            text=True,
+            timeout=PROBE_TIMEOUT
+        )
+        data = json.loads(result.stdout) if result.returncode == 0 else None
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+    if not data or not data.get("streams"):
+        return None
+
+    stream = data["streams"][0]
+    bit_rate = stream.get("bit_rate") or data.get("format", {}).get("bit_rate")
+    try:
+        bit_rate = int(bit_rate) / 1000
+    except (TypeError, ValueError):
+        bit_rate = None
+    return {"codec": stream.get("codec_name"), "bit_rate": bit_rate}
+
+
+def can_stream_copy(probe, selected_format, quality):
+    if not probe:
+        return False
+    if selected_format == "wav":
+        return probe["codec"] == WAV_CODECS.get(quality, "pcm_s16le")
+    if probe["codec"] != COPY_CODECS.get(selected_format):
+        return False
+    wanted = requested_bitrate(quality)
+    return wanted is not None and probe["bit_rate"] is not None and probe["bit_rate"] >= wanted * BITRATE_TOLERANCE
+
+
+def output_extension(selected_format, source):
+    if selected_format == ORIGINAL_FORMAT:
+        return os.path.splitext(source)[1].lstrip(".") or "webm"
+    return selected_format
+
+
+def stream_probe(info):
+    # yt-dlp's own format metadata stands in for ffprobe when the source is a pipe.
+    codec = (info.get("acodec") or "").split(".")[0]
+    return {"codec": "aac" if codec == "mp4a" else codec, "bit_rate": info.get("abr")}
+
+
+def _has_encoder(name):
+    info = tools.info("ffmpeg")
+    return bool(info and info.capabilities and name in info.capabilities)
+
+
+def encoder_args(selected_format, quality):
+    # Same VBR scales yt-dlp's FFmpegExtractAudio uses for --audio-quality.
+    level = audio_quality_level(quality)
+    if selected_format == "mp3":
+        return ["-c:a", "libmp3lame", "-q:a", str(level)]
+    if selected_format == "m4a":
+        if _has_encoder("libfdk_aac"):
+            return ["-c:a", "libfdk_aac", "-vbr", str(int(5 - 4 * level / 10))]
+        return ["-c:a", "aac", "-q:a", f"{4 - 3.9 * level / 10:g}"]
+    if selected_format == "wav":
+        return ["-c:a", WAV_CODECS.get(quality, "pcm_s16le")]
+    raise ValueError(f"Cannot transcode to {selected_format}: choose an audio format")
+
+
+def metadata_args(metadata):
+    args = []
+    for key, value in (metadata or {}).items():
+        if value is not None:
+            args.extend(["-metadata", f"{key}={value}"])
+    return args
+
+
+def build_ffmpeg_command(source, dest, selected_format, quality, metadata=None, copy=False):
+    return [
+        tools.require("ffmpeg"), "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+        "-i", source, "-vn", "-map_metadata", "0",
+        *(["-c:a", "copy"] if copy else encoder_args(selected_format, quality)),
+        *metadata_args(metadata),
+        dest
+    ]
+
+
+def partial_path(dest):
+    root, ext = os.path.splitext(dest)
+    return f"{root}.part{ext}"
+
+
+class Transcode:
+    def __init__(self, source, dest, selected_format, quality, metadata=None):
+        self.source = source
+        self.dest = dest
+        self.format = selected_format
+        self.quality = quality
+        self.metadata = metadata
+        self.copy = None
+        self.cancelled = False
+        self._process = None
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        if self.copy is None:
+            self.copy = self.format == ORIGINAL_FORMAT or can_stream_copy(probe_audio(self.source), self.format, self.quality)
+        return self.copy
+
+    def run(self):
+        temp_path = partial_path(self.dest)
+        cmd = build_ffmpeg_command(self.source, temp_path, self.format, self.quality, self.metadata, self.prepare())
+        with self._lock:
+            if self.cancelled:
+                return "Cancelled"
+            self._process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=os.environ
+            )
+        _, stderr = self._process.communicate()
+
+        if self._process.returncode == 0 and not self.cancelled:
+            os.replace(temp_path, self.dest)
+            return None
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        if self.cancelled:
+            return "Cancelled"
+        lines = [line for line in stderr.splitlines() if line.strip()]
+        return f"ERROR: ffmpeg could not convert to {self.format}: {lines[-1] if lines else 'unknown error'}"
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._process and self._process.poll() is None:
+                self._process.kill()
+
+
+class StreamTranscode:
+    def __init__(self, selected_format, quality):
+        self.format = selected_format
+        self.quality = quality
+        self.dest = None
+        self.copy = False
+        self.error = None
+        self.cancelled = False
+        self.returncode = None
+        self._source = None
+        self._encoder = None
+        self._stderr_tail = collections.deque(maxlen=5)
+        self._drain_thread = None
+        self._lock = threading.Lock()
+
+    def spawn(self, cmd, merge_stderr=True):
+        with self._lock:
+            self._source = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ)
+        self.stdout = io.TextIOWrapper(self._source.stderr, encoding="utf-8", errors="replace")
+        return self
+
+    def start(self, dest, metadata=None, probe=None):
+        self.dest = dest
+        self.copy = can_stream_copy(probe, self.format, self.quality)
+        cmd = build_ffmpeg_command("pipe:0", partial_path(dest), self.format, self.quality, metadata, self.copy)
+        with self._lock:
+            if self.cancelled:
+                return
+            self._encoder = subprocess.Popen(
+                cmd,
+                stdin=self._source.stdout,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=os.environ
+            )
+        self._source.stdout.close()
+        self._drain_thread = threading.Thread(target=self._drain, daemon=True)
+        self._drain_thread.start()
+
+    def _drain(self):
+        for line in self._encoder.stderr:
+            if line.strip():
+                self._stderr_tail.append(line.strip())
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        returncode = self._source.wait()
+        if self._encoder is None:
+            self._source.stdout.close()
+            self.returncode = returncode or 1
+            return self.returncode
+
+        encoder_returncode = self._encoder.wait()
+        self._drain_thread.join()
+        temp_path = partial_path(self.dest)
+        if returncode == 0 and encoder_returncode == 0 and not self.cancelled:
+            os.replace(temp_path, self.dest)
+        else:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            if encoder_returncode != 0 and not self.cancelled:
+                detail = self._stderr_tail[-1] if self._stderr_tail else "unknown error"
+                self.error = f"ERROR: ffmpeg could not convert to {self.format}: {detail}"
+        self.returncode = returncode or encoder_returncode
+        return self.returncode
+
+    def kill(self):
+        with self._lock:
+            for process in (self._source, self._encoder):
+                if process and process.poll() is None:
+                    process.kill()
+
+    def cancel(self):
+        self.cancelled = True
+        self.kill()
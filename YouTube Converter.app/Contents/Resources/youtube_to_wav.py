@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 import subprocess
 import sys
-import os
 import threading
 import json
+import multiprocessing
 import urllib.request
-import re
 import webbrowser
 import customtkinter as ctk
-from tkinter import filedialog, messagebox
-
-os.environ["PATH"] = "/opt/homebrew/bin:/usr/local/bin:" + os.environ.get("PATH", "")
-
-HOMEBREW_BIN = "/opt/homebrew/bin"
-YTDLP_PATH = f"{HOMEBREW_BIN}/yt-dlp"
-FFMPEG_PATH = f"{HOMEBREW_BIN}/ffmpeg"
-BREW_PATH = f"{HOMEBREW_BIN}/brew"
+from tkinter import filedialog
+from converter_engine import (
+    AUDIO_FORMATS,
+    DEFAULT_PLAYLIST_WORKERS,
+    QUALITY_OPTIONS,
+    ConverterEngine,
+    create_backend,
+    describe_progress,
+    format_bytes,
+    format_rate,
+    format_targets,
+    is_playlist_url,
+    match_quality,
+    parse_rate,
+)
+from download_archive import DownloadArchive
+from job_queue import JobScheduler, JobStore
+from source_cache import SourceCache, describe_cache_stats
+from tool_registry import tools
 
 GITHUB_REPO = "aaf2tbz/Youtube-Converter-Application"
 GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_REPO}/main/src/youtube_to_wav.py"
@@ -50,18 +60,24 @@ COLORS = {
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
-QUALITY_OPTIONS = {
-    "mp3": ["128 kbps", "192 kbps", "256 kbps", "320 kbps"],
-    "m4a": ["128 kbps", "192 kbps", "256 kbps", "320 kbps"],
-    "wav": ["Lossless (16-bit)", "Lossless (24-bit)"],
-    "mp4": ["360p", "480p", "720p", "1080p", "1440p", "2160p (4K)"]
+PLAYLIST_WORKER_OPTIONS = ["1", "2", "4", "6", "8"]
+RATE_LIMIT_OPTIONS = [format_rate(rate) for rate in [None, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2]]
+UI_FLUSH_MS = 50
+DEPS_RECHECK_MS = 30000
+QUEUE_REFRESH_MS = 500
+QUEUE_VISIBLE_JOBS = 50
+JOB_STATUS_COLORS = {
+    "pending": "#a0a0a0",
+    "running": "#fbbf24",
+    "completed": "#4ade80",
+    "partial": "#fbbf24",
+    "failed": "#ff6b6b",
+    "cancelled": "#a0a0a0"
 }
 
 def check_dependency(name):
-    if name == "yt-dlp":
-        return os.path.exists(YTDLP_PATH)
-    elif name == "ffmpeg":
-        return os.path.exists(FFMPEG_PATH)
+    if name in ("yt-dlp", "ffmpeg"):
+        return tools.available(name)
     elif name == "customtkinter":
         try:
             import customtkinter
@@ -76,6 +92,40 @@ def check_all_deps():
     DEPS["customtkinter"] = check_dependency("customtkinter")
     return all(DEPS.values())
 
+class DependencyState:
+    def __init__(self):
+        self._valid = False
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._valid = False
+
+    def refresh(self):
+        with self._lock:
+            tools.refresh()
+            check_all_deps()
+            self._valid = True
+        return self.ready
+
+    def ensure(self):
+        if not self._valid:
+            self.refresh()
+        return self.ready
+
+    def has(self, name):
+        self.ensure()
+        return bool(DEPS.get(name))
+
+    @property
+    def ready(self):
+        return all(DEPS.values())
+
+    @property
+    def missing(self):
+        return [k for k, v in DEPS.items() if not v]
+
+dep_state = DependencyState()
+
 def install_deps(callback=None):
     def run_install():
         missing = [k for k, v in DEPS.items() if not v]
@@ -84,14 +134,14 @@ def install_deps(callback=None):
                 callback(True, "All dependencies ready")
             return
         
-        has_brew = os.path.exists(BREW_PATH)
+        has_brew = tools.available("brew")
         
         for dep in missing:
             try:
                 if dep == "customtkinter":
                     cmd = [sys.executable, "-m", "pip", "install", "--break-system-packages", dep]
                 elif has_brew:
-                    cmd = [BREW_PATH, "install", dep]
+                    cmd = [tools.path("brew"), "install", dep]
                 elif dep == "yt-dlp":
                     cmd = [sys.executable, "-m", "pip", "install", "yt-dlp"]
                 else:
@@ -100,6 +150,7 @@ def install_deps(callback=None):
                     return
                 
                 subprocess.run(cmd, check=True)
+                tools.refresh(dep)
                 DEPS[dep] = check_dependency(dep)
             except subprocess.CalledProcessError as e:
                 if callback:
@@ -151,22 +202,7 @@ def check_for_updates():
     return False
 
 def get_dependency_versions():
-    versions = {}
-    try:
-        result = subprocess.run([YTDLP_PATH, "--version"], capture_output=True, text=True)
-        versions["yt-dlp"] = result.stdout.strip() if result.returncode == 0 else "Not installed"
-    except:
-        versions["yt-dlp"] = "Not installed"
-    
-    try:
-        result = subprocess.run([FFMPEG_PATH, "-version"], capture_output=True, text=True)
-        if result.returncode == 0:
-            first_line = result.stdout.split("\n")[0]
-            versions["ffmpeg"] = first_line.split(" ")[2] if len(first_line.split(" ")) > 2 else "Unknown"
-        else:
-            versions["ffmpeg"] = "Not installed"
-    except:
-        versions["ffmpeg"] = "Not installed"
+    versions = {name: tools.version(name) for name in ("yt-dlp", "ffmpeg", "ffprobe")}
     
     try:
         import customtkinter
@@ -176,20 +212,67 @@ def get_dependency_versions():
     
     return versions
 
+class UiDispatcher:
+    def __init__(self, root, interval_ms=UI_FLUSH_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.root.after(self.interval_ms, self._flush)
+
+    def push(self, key, callback):
+        with self._lock:
+            self._pending[key] = callback
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for callback in pending.values():
+            try:
+                callback()
+            except Exception:
+                pass
+        self.root.after(self.interval_ms, self._flush)
+
 class App(ctk.CTk):
     def __init__(self):
         super().__init__()
         
         self.title("YouTube Converter")
-        self.geometry("520x750")
-        self.minsize(450, 650)
+        self.geometry("520x900")
+        self.minsize(450, 760)
         self.configure(fg_color=COLORS["bg"])
         
         self.success_popup = None
         self.latest_release_url = f"https://github.com/{GITHUB_REPO}/releases/latest"
+        self.queue_rows = {}
+        self.probe_counts = {}
+        self.live_progress = {}
+        self._queue_loading = False
+        self._queue_stale = False
+        self.ui = UiDispatcher(self)
         
         self._create_widgets()
+        self.job_store = JobStore()
+        self.source_cache = SourceCache()
+        concurrency = self._get_playlist_workers()
+        self.scheduler = JobScheduler(
+            self.job_store,
+            ConverterEngine(
+                workers=concurrency,
+                max_downloads=concurrency,
+                archive=DownloadArchive(),
+                backend=create_backend(size=concurrency),
+                source_cache=self.source_cache
+            ),
+            concurrency=concurrency,
+            listener=self._on_queue_event
+        ).start()
+        self.rate_limit_var.set(format_rate(self.scheduler.rate_limit))
         self.after(100, self.update_deps_status)
+        self.after(DEPS_RECHECK_MS, self._periodic_deps_check)
+        self.after(100, self.load_dependency_versions)
+        self.after(QUEUE_REFRESH_MS, self._refresh_queue)
     
     def _create_widgets(self):
         title = ctk.CTkLabel(
@@ -314,7 +397,7 @@ class App(ctk.CTk):
         self.format_combo = ctk.CTkComboBox(
             options_card,
             variable=self.format_var,
-            values=["mp3", "m4a", "wav", "mp4"],
+            values=list(QUALITY_OPTIONS),
             font=("SF Pro Display", 12),
             dropdown_font=("SF Pro Display", 12),
             fg_color=COLORS["input"],
@@ -355,6 +438,87 @@ class App(ctk.CTk):
         )
         self.quality_combo.grid(row=1, column=2, columnspan=2, padx=16, pady=(0, 12), sticky="ew")
         self.quality_combo.set(QUALITY_OPTIONS["mp3"][0])
+
+        workers_label = ctk.CTkLabel(
+            options_card,
+            text="Parallel Downloads",
+            font=("SF Pro Display", 12),
+            text_color=COLORS["text"]
+        )
+        workers_label.grid(row=2, column=0, padx=16, pady=(0, 4), sticky="w")
+
+        self.workers_var = ctk.StringVar(value=str(DEFAULT_PLAYLIST_WORKERS))
+        self.workers_combo = ctk.CTkComboBox(
+            options_card,
+            variable=self.workers_var,
+            values=PLAYLIST_WORKER_OPTIONS,
+            font=("SF Pro Display", 12),
+            dropdown_font=("SF Pro Display", 12),
+            fg_color=COLORS["input"],
+            border_color=COLORS["border"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["primary_hover"],
+            dropdown_fg_color=COLORS["card"],
+            corner_radius=8,
+            height=32,
+            state="readonly",
+            command=self.update_concurrency
+        )
+        self.workers_combo.grid(row=3, column=0, padx=16, pady=(0, 12), sticky="ew")
+
+        extra_formats_label = ctk.CTkLabel(
+            options_card,
+            text="Also Convert To",
+            font=("SF Pro Display", 12),
+            text_color=COLORS["text"]
+        )
+        extra_formats_label.grid(row=2, column=2, padx=16, pady=(0, 4), sticky="w")
+
+        extra_formats_frame = ctk.CTkFrame(options_card, fg_color="transparent")
+        extra_formats_frame.grid(row=3, column=2, columnspan=2, padx=16, pady=(0, 12), sticky="ew")
+        self.extra_format_vars = {}
+        for extra_format in AUDIO_FORMATS:
+            var = ctk.BooleanVar(value=False)
+            ctk.CTkCheckBox(
+                extra_formats_frame,
+                text=extra_format,
+                variable=var,
+                font=("SF Pro Display", 12),
+                fg_color=COLORS["primary"],
+                hover_color=COLORS["primary_hover"],
+                border_color=COLORS["border"],
+                checkbox_width=18,
+                checkbox_height=18,
+                width=60
+            ).pack(side="left")
+            self.extra_format_vars[extra_format] = var
+
+        rate_limit_label = ctk.CTkLabel(
+            options_card,
+            text="Bandwidth Limit",
+            font=("SF Pro Display", 12),
+            text_color=COLORS["text"]
+        )
+        rate_limit_label.grid(row=4, column=0, padx=16, pady=(0, 4), sticky="w")
+
+        self.rate_limit_var = ctk.StringVar(value=RATE_LIMIT_OPTIONS[0])
+        self.rate_limit_combo = ctk.CTkComboBox(
+            options_card,
+            variable=self.rate_limit_var,
+            values=RATE_LIMIT_OPTIONS,
+            font=("SF Pro Display", 12),
+            dropdown_font=("SF Pro Display", 12),
+            fg_color=COLORS["input"],
+            border_color=COLORS["border"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["primary_hover"],
+            dropdown_fg_color=COLORS["card"],
+            corner_radius=8,
+            height=32,
+            command=self.update_rate_limit
+        )
+        self.rate_limit_combo.grid(row=5, column=0, padx=16, pady=(0, 12), sticky="ew")
+        self.rate_limit_combo.bind("<Return>", self.update_rate_limit)
         
         self.download_btn = ctk.CTkButton(
             self,
@@ -389,6 +553,19 @@ class App(ctk.CTk):
         )
         self.status_label.pack(pady=(0, 6))
 
+        self.cancel_probe_btn = ctk.CTkButton(
+            self,
+            text="Cancel",
+            font=("SF Pro Display", 12),
+            fg_color=COLORS["secondary"],
+            hover_color=COLORS["accent"],
+            text_color=COLORS["secondary_foreground"],
+            corner_radius=8,
+            height=28,
+            width=90,
+            command=self.cancel_playlist_probes
+        )
+
         self.playlist_progress = ctk.CTkProgressBar(
             self,
             height=10,
@@ -404,6 +581,67 @@ class App(ctk.CTk):
             font=("SF Pro Display", 11),
             text_color=COLORS["text_muted"]
         )
+
+        self.queue_frame = ctk.CTkFrame(
+            self,
+            fg_color=COLORS["card"],
+            corner_radius=12,
+            border_width=1,
+            border_color=COLORS["border"]
+        )
+        self.queue_frame.pack(fill="x", padx=20, pady=(0, 12))
+        self.queue_frame.columnconfigure(0, weight=1)
+
+        queue_title = ctk.CTkLabel(
+            self.queue_frame,
+            text="Queue",
+            font=("SF Pro Display", 12, "bold"),
+            text_color=COLORS["text"]
+        )
+        queue_title.grid(row=0, column=0, padx=16, pady=(12, 4), sticky="w")
+
+        self.clear_queue_btn = ctk.CTkButton(
+            self.queue_frame,
+            text="Clear Finished",
+            font=("SF Pro Display", 11),
+            fg_color=COLORS["secondary"],
+            hover_color=COLORS["accent"],
+            text_color=COLORS["secondary_foreground"],
+            corner_radius=8,
+            height=26,
+            width=110,
+            command=self.clear_finished_jobs
+        )
+        self.clear_queue_btn.grid(row=0, column=2, padx=(0, 16), pady=(12, 4))
+
+        self.retry_failed_btn = ctk.CTkButton(
+            self.queue_frame,
+            text="Retry Failed",
+            font=("SF Pro Display", 11),
+            fg_color=COLORS["secondary"],
+            hover_color=COLORS["accent"],
+            text_color=COLORS["secondary_foreground"],
+            corner_radius=8,
+            height=26,
+            width=110,
+            command=self.retry_failed_jobs
+        )
+        self.retry_failed_btn.grid(row=0, column=1, padx=8, pady=(12, 4))
+
+        self.queue_list = ctk.CTkScrollableFrame(
+            self.queue_frame,
+            fg_color=COLORS["card"],
+            height=110
+        )
+        self.queue_list.grid(row=1, column=0, columnspan=3, padx=8, pady=(0, 12), sticky="ew")
+
+        self.queue_empty_label = ctk.CTkLabel(
+            self.queue_list,
+            text="No jobs queued",
+            font=("SF Pro Display", 11),
+            text_color=COLORS["text_muted"]
+        )
+        self.queue_empty_label.pack(anchor="w", padx=8)
         
         self.update_frame = ctk.CTkFrame(
             self,
@@ -430,15 +668,21 @@ class App(ctk.CTk):
         )
         self.update_status.pack(pady=(0, 8), padx=16, anchor="w")
         
-        dep_versions = get_dependency_versions()
-        versions_text = f"yt-dlp: {dep_versions.get('yt-dlp', 'N/A')} | ffmpeg: {dep_versions.get('ffmpeg', 'N/A')} | customtkinter: {dep_versions.get('customtkinter', 'N/A')}"
         self.dep_versions_label = ctk.CTkLabel(
             self.update_frame,
-            text=versions_text,
+            text="yt-dlp: … | ffmpeg: … | customtkinter: …",
             font=("SF Pro Display", 10),
             text_color=COLORS["text_muted"]
         )
-        self.dep_versions_label.pack(pady=(0, 12), padx=16, anchor="w")
+        self.dep_versions_label.pack(pady=(0, 4), padx=16, anchor="w")
+
+        self.cache_stats_label = ctk.CTkLabel(
+            self.update_frame,
+            text="Source cache: …",
+            font=("SF Pro Display", 10),
+            text_color=COLORS["text_muted"]
+        )
+        self.cache_stats_label.pack(pady=(0, 12), padx=16, anchor="w")
         
         self.check_update_btn = ctk.CTkButton(
             self.update_frame,
@@ -477,11 +721,11 @@ class App(ctk.CTk):
         self.quality_combo.set(qualities[0] if qualities else "")
     
     def update_button_state(self, event=None):
-        check_all_deps()
         url = self.url_entry.get().strip()
         name = self.name_entry.get().strip()
+        tools_ready = dep_state.has("yt-dlp") and dep_state.has("ffmpeg")
         
-        if url and name and DEPS["yt-dlp"] and DEPS["ffmpeg"]:
+        if url and name and tools_ready:
             self.download_btn.configure(
                 fg_color=COLORS["primary"],
                 state="normal"
@@ -492,7 +736,7 @@ class App(ctk.CTk):
                 state="disabled"
             )
 
-        if url and DEPS["yt-dlp"] and DEPS["ffmpeg"]:
+        if url and tools_ready:
             self.playlist_btn.configure(
                 fg_color=COLORS["secondary"],
                 state="normal"
@@ -503,18 +747,11 @@ class App(ctk.CTk):
                 state="disabled"
             )
 
-    def _set_download_controls(self, is_busy):
-        state = "disabled" if is_busy else "normal"
-        self.url_entry.configure(state=state)
-        self.name_entry.configure(state=state)
-        self.format_combo.configure(state="disabled" if is_busy else "readonly")
-        self.quality_combo.configure(state="disabled" if is_busy else "readonly")
-
     def _show_playlist_progress(self):
         self.playlist_progress.set(0)
         self.playlist_progress_label.configure(text="0%")
-        self.playlist_progress.pack(fill="x", padx=20, pady=(0, 4))
-        self.playlist_progress_label.pack(pady=(0, 8))
+        self.playlist_progress.pack(fill="x", padx=20, pady=(0, 4), before=self.queue_frame)
+        self.playlist_progress_label.pack(pady=(0, 8), before=self.queue_frame)
 
     def _set_playlist_progress(self, fraction):
         value = max(0.0, min(1.0, fraction))
@@ -525,63 +762,35 @@ class App(ctk.CTk):
         self.playlist_progress.pack_forget()
         self.playlist_progress_label.pack_forget()
 
-    def _build_yt_dlp_command(self, url, selected_format, quality, output_template, playlist_mode=False):
-        cmd = [YTDLP_PATH]
-
-        if playlist_mode:
-            cmd.extend(["--yes-playlist", "--ignore-errors"])
+    def _get_playlist_workers(self):
+        try:
+            return max(1, int(self.workers_var.get()))
+        except ValueError:
+            return DEFAULT_PLAYLIST_WORKERS
 
-        if selected_format in ["mp3", "m4a", "wav"]:
-            cmd.extend(["-x", "--audio-format", selected_format])
+    def update_concurrency(self, event=None):
+        self.scheduler.set_concurrency(self._get_playlist_workers())
 
-            if selected_format in ["mp3", "m4a"]:
-                if "320" in quality:
-                    cmd.extend(["--audio-quality", "0"])
-                elif "256" in quality:
-                    cmd.extend(["--audio-quality", "1"])
-                elif "192" in quality:
-                    cmd.extend(["--audio-quality", "2"])
-                else:
-                    cmd.extend(["--audio-quality", "4"])
-
-        elif selected_format == "mp4":
-            resolution_map = {
-                "360p": "360",
-                "480p": "480",
-                "720p": "720",
-                "1080p": "1080",
-                "1440p": "1440",
-                "2160p (4K)": "2160"
-            }
-            res = resolution_map.get(quality, "720")
-            cmd.extend([
-                "-f", f"bestvideo[height<={res}]+bestaudio/best[height<={res}]",
-                "--merge-output-format", "mp4"
-            ])
-
-        cmd.extend(["-o", output_template, url])
-        return cmd
-
-    def _is_playlist_url(self, url):
-        return bool(re.search(r"[?&]list=", url))
-
-    def _count_playlist_items(self, url):
+    def update_rate_limit(self, event=None):
         try:
-            result = subprocess.run(
-                [YTDLP_PATH, "--flat-playlist", "--print", "id", "--yes-playlist", url],
-                capture_output=True,
-                text=True,
-                env=os.environ
-            )
-            if result.returncode != 0:
-                return 0
-            return len([line for line in result.stdout.splitlines() if line.strip()])
-        except Exception:
-            return 0
-    
+            rate = parse_rate(self.rate_limit_var.get())
+        except ValueError as e:
+            self.show_error("Bandwidth Limit", str(e))
+            rate = self.scheduler.rate_limit
+        else:
+            self.scheduler.set_rate_limit(rate)
+        self.rate_limit_var.set(format_rate(rate))
+
+    def _periodic_deps_check(self):
+        before = dict(DEPS)
+        dep_state.refresh()
+        if DEPS != before:
+            self.update_deps_status()
+        self.after(DEPS_RECHECK_MS, self._periodic_deps_check)
+
     def update_deps_status(self):
-        check_all_deps()
-        missing = [k for k, v in DEPS.items() if not v]
+        dep_state.ensure()
+        missing = dep_state.missing
         if missing:
             self.deps_label.configure(
                 text=f"⚠ Missing: {', '.join(missing)}",
@@ -601,14 +810,15 @@ class App(ctk.CTk):
         self.deps_label.configure(text="Installing dependencies...", text_color="#fbbf24")
         
         def on_complete(success, message):
-            self.after(0, lambda: self.install_btn.configure(text="Install"))
             if success:
-                self.after(0, lambda: self.deps_label.configure(text=message, text_color="#4ade80"))
+                self.ui.push("install_btn", lambda: self.install_btn.configure(text="Install"))
+                self.ui.push("deps_label", lambda: self.deps_label.configure(text=message, text_color="#4ade80"))
             else:
-                self.after(0, lambda: self.deps_label.configure(text=message, text_color="#ff6b6b"))
-                self.after(0, lambda: self.show_error("Installation Error", message))
-                self.after(0, lambda: self.install_btn.configure(state="normal"))
-            self.after(0, self.update_deps_status)
+                self.ui.push("install_btn", lambda: self.install_btn.configure(text="Install", state="normal"))
+                self.ui.push("deps_label", lambda: self.deps_label.configure(text=message, text_color="#ff6b6b"))
+                self.ui.push("popup", lambda: self.show_error("Installation Error", message))
+            dep_state.invalidate()
+            self.ui.push("deps_status", self.update_deps_status)
         
         install_deps(on_complete)
     
@@ -633,31 +843,44 @@ class App(ctk.CTk):
             dep_versions = get_dependency_versions()
             
             if has_update:
-                self.after(0, lambda: self.update_status.configure(
+                self.ui.push("update_status", lambda: self.update_status.configure(
                     text=f"New version available: v{latest_version} (current: v{CURRENT_VERSION})",
                     text_color="#fbbf24"
                 ))
-                self.after(0, lambda: self.check_update_btn.configure(
+                self.ui.push("check_update_btn", lambda: self.check_update_btn.configure(
                     state="normal",
                     text="Update Now",
                     command=self.open_update_page
                 ))
             else:
-                self.after(0, lambda: self.update_status.configure(
+                self.ui.push("update_status", lambda: self.update_status.configure(
                     text=f"You're up to date (v{CURRENT_VERSION})",
                     text_color="#4ade80"
                 ))
-                self.after(0, lambda: self.check_update_btn.configure(
+                self.ui.push("check_update_btn", lambda: self.check_update_btn.configure(
                     state="normal",
                     text="Check for Updates",
                     command=self.check_updates
                 ))
             
             versions_text = f"yt-dlp: {dep_versions.get('yt-dlp', 'N/A')} | ffmpeg: {dep_versions.get('ffmpeg', 'N/A')} | customtkinter: {dep_versions.get('customtkinter', 'N/A')}"
-            self.after(0, lambda: self.dep_versions_label.configure(text=versions_text))
+            self.ui.push("dep_versions_label", lambda: self.dep_versions_label.configure(text=versions_text))
         
         threading.Thread(target=do_check, daemon=True).start()
 
+    def load_dependency_versions(self):
+        def do_load():
+            dep_versions = get_dependency_versions()
+            versions_text = f"yt-dlp: {dep_versions.get('yt-dlp', 'N/A')} | ffmpeg: {dep_versions.get('ffmpeg', 'N/A')} | customtkinter: {dep_versions.get('customtkinter', 'N/A')}"
+            self.ui.push("dep_versions_label", lambda: self.dep_versions_label.configure(text=versions_text))
+            cache_text = describe_cache_stats(self.source_cache.stats())
+            self.ui.push("cache_stats_label", lambda: self.cache_stats_label.configure(text=cache_text))
+
+        threading.Thread(target=do_load, daemon=True).start()
+
+    def _refresh_cache_stats(self):
+        self.cache_stats_label.configure(text=describe_cache_stats(self.source_cache.stats()))
+
     def open_update_page(self):
         update_url = self.latest_release_url or f"https://github.com/{GITHUB_REPO}/releases/latest"
         opened = webbrowser.open(update_url)
@@ -674,12 +897,15 @@ class App(ctk.CTk):
         self.update_status.configure(text="Updating dependencies...", text_color="#fbbf25")
         
         def do_update():
-            missing = [k for k, v in DEPS.items() if not v]
+            missing = dep_state.missing
             
             if not missing:
-                self.after(0, lambda: self.update_status.configure(text="Reinstalling dependencies...", text_color="#fbbf25"))
+                self.ui.push("update_status", lambda: self.update_status.configure(
+                    text="Reinstalling dependencies...",
+                    text_color="#fbbf25"
+                ))
             
-            has_brew = os.path.exists(BREW_PATH)
+            has_brew = tools.available("brew")
             deps_to_update = ["yt-dlp", "ffmpeg", "customtkinter"]
             
             for dep in deps_to_update:
@@ -687,24 +913,29 @@ class App(ctk.CTk):
                     if dep == "customtkinter":
                         cmd = [sys.executable, "-m", "pip", "install", "--upgrade", "--break-system-packages", dep]
                     elif has_brew:
-                        cmd = [BREW_PATH, "upgrade", dep]
+                        cmd = [tools.path("brew"), "upgrade", dep]
                     else:
                         continue
                     subprocess.run(cmd, capture_output=True, check=False)
+                    tools.refresh(dep)
                 except:
                     pass
             
             dep_versions = get_dependency_versions()
             
-            self.after(0, lambda: self.update_deps_btn.configure(state="normal", text="Update Dependencies"))
-            self.after(0, lambda: self.update_status.configure(
+            self.ui.push("update_deps_btn", lambda: self.update_deps_btn.configure(
+                state="normal",
+                text="Update Dependencies"
+            ))
+            self.ui.push("update_status", lambda: self.update_status.configure(
                 text="Dependencies updated!",
                 text_color="#4ade80"
             ))
             
             versions_text = f"yt-dlp: {dep_versions.get('yt-dlp', 'N/A')} | ffmpeg: {dep_versions.get('ffmpeg', 'N/A')} | customtkinter: {dep_versions.get('customtkinter', 'N/A')}"
-            self.after(0, lambda: self.dep_versions_label.configure(text=versions_text))
-            self.after(0, self.update_deps_status)
+            self.ui.push("dep_versions_label", lambda: self.dep_versions_label.configure(text=versions_text))
+            dep_state.invalidate()
+            self.ui.push("deps_status", self.update_deps_status)
         
         threading.Thread(target=do_update, daemon=True).start()
     
@@ -789,7 +1020,7 @@ class App(ctk.CTk):
         ).pack(pady=16)
     
     def download_and_convert(self):
-        if not check_all_deps():
+        if not dep_state.ensure():
             self.show_error("Missing Dependencies", "Please install dependencies first.")
             return
         
@@ -805,60 +1036,31 @@ class App(ctk.CTk):
             return
         
         selected_format = self.format_var.get()
-        for ext in [".mp3", ".m4a", ".wav", ".mp4"]:
-            filename = filename.replace(ext, "")
-        
+        quality = self.quality_var.get()
+        targets = self._selected_targets(selected_format, quality)
+        if len(targets) > 1 and selected_format not in AUDIO_FORMATS:
+            self.show_error("Error", "Extra formats can only be added to an audio format")
+            return
+
         output_path = filedialog.askdirectory(title="Select output folder")
         if not output_path:
             return
-        
-        self.download_btn.configure(state="disabled", fg_color="#3d3d5c")
-        self.playlist_btn.configure(state="disabled", fg_color="#3d3d5c")
-        self._set_download_controls(True)
-        self._hide_playlist_progress()
-        self.status_label.configure(text="Downloading and converting...", text_color="#fbbf24")
-        
-        def run_download():
-            try:
-                output_template = os.path.join(output_path, f"{filename}.{selected_format}")
-                quality = self.quality_var.get()
-                
-                cmd = self._build_yt_dlp_command(url, selected_format, quality, output_template)
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, env=os.environ)
-                
-                if result.returncode == 0:
-                    actual_file = output_template
-                    if not os.path.exists(actual_file):
-                        for f in os.listdir(output_path):
-                            if f.startswith(filename) and f.endswith(f".{selected_format}"):
-                                actual_file = os.path.join(output_path, f)
-                                break
-                    
-                    self.after(0, lambda: self.status_label.configure(
-                        text=f"✓ Saved to: {actual_file}",
-                        text_color="#4ade80"
-                    ))
-                    self.after(0, lambda: self.show_success(actual_file))
-                else:
-                    error_msg = result.stderr or result.stdout or "Unknown error"
-                    if len(error_msg) > 150:
-                        error_msg = error_msg[:150] + "..."
-                    self.after(0, lambda: self.status_label.configure(text="Download failed", text_color="#ff6b6b"))
-                    self.after(0, lambda: self.show_error("Error", error_msg))
-            except Exception as e:
-                self.after(0, lambda: self.status_label.configure(text="Error occurred", text_color="#ff6b6b"))
-                self.after(0, lambda: self.show_error("Error", str(e)))
-            finally:
-                self.after(0, lambda: self.download_btn.configure(state="normal"))
-                self.after(0, lambda: self.playlist_btn.configure(state="normal"))
-                self.after(0, lambda: self._set_download_controls(False))
-                self.after(0, self.update_button_state)
 
-        threading.Thread(target=run_download, daemon=True).start()
+        if len(targets) > 1:
+            job_id = self.scheduler.submit("multi", url, output_path, *format_targets(targets), filename)
+        else:
+            job_id = self.scheduler.submit("single", url, output_path, selected_format, quality, filename)
+        self._on_job_queued(job_id)
+
+    def _selected_targets(self, selected_format, quality):
+        targets = [(selected_format, quality)]
+        for extra_format, var in self.extra_format_vars.items():
+            if var.get() and extra_format != selected_format:
+                targets.append((extra_format, match_quality(extra_format, quality)))
+        return targets
 
     def download_playlist(self):
-        if not check_all_deps():
+        if not dep_state.ensure():
             self.show_error("Missing Dependencies", "Please install dependencies first.")
             return
 
@@ -867,7 +1069,7 @@ class App(ctk.CTk):
             self.show_error("Error", "Please enter a YouTube playlist URL")
             return
 
-        if not self._is_playlist_url(url):
+        if not is_playlist_url(url):
             self.show_error("Error", "Playlist URL must include a list= parameter")
             return
 
@@ -875,112 +1077,233 @@ class App(ctk.CTk):
         if not output_path:
             return
 
-        selected_format = self.format_var.get()
-        quality = self.quality_var.get()
-        output_template = os.path.join(output_path, "%(playlist_index)02d - %(title)s.%(ext)s")
-        total_items_hint = self._count_playlist_items(url)
-
-        self.download_btn.configure(state="disabled", fg_color="#3d3d5c")
-        self.playlist_btn.configure(state="disabled", fg_color="#3d3d5c")
-        self._set_download_controls(True)
-        self._show_playlist_progress()
-        if total_items_hint > 0:
-            self.status_label.configure(
-                text=f"Downloading playlist... 0/{total_items_hint}",
-                text_color="#fbbf24"
+        job_id = self.scheduler.submit("playlist", url, output_path, self.format_var.get(), self.quality_var.get())
+        self._on_job_queued(job_id)
+
+    def _on_job_queued(self, job_id):
+        self.url_entry.delete(0, "end")
+        self.name_entry.delete(0, "end")
+        self.update_button_state()
+        self.status_label.configure(text=f"Job #{job_id} added to queue", text_color="#fbbf24")
+        self._refresh_queue(reschedule=False)
+
+    def clear_finished_jobs(self):
+        self.job_store.clear_finished()
+        self._refresh_queue(reschedule=False)
+
+    def retry_failed_jobs(self):
+        rows = self.job_store.retryable_jobs()
+        retried = [row for row in rows if self.scheduler.retry_failed(row["id"])]
+        if retried:
+            items = sum(row["failed_items"] for row in retried)
+            jobs = ", ".join(f"#{row['id']}" for row in retried)
+            text = f"Retrying {items} failed item(s) in {jobs}" if items else f"Retrying {jobs}"
+            self.status_label.configure(text=text, text_color="#fbbf24")
+        else:
+            self.status_label.configure(text="No failed jobs to retry", text_color=COLORS["text_muted"])
+        self._refresh_queue(reschedule=False)
+
+    def _job_row_text(self, row):
+        name = row["filename"] or row["url"]
+        if len(name) > 42:
+            name = name[:42] + "..."
+        text = f"#{row['id']}  {row['kind']}  {row['format']}  {row['status']}"
+        if row["kind"] == "playlist" and row["total_items"]:
+            text += f"  {row['done_items'] + row['failed_items']}/{row['total_items']}"
+            if row["failed_items"] and row["status"] != "running":
+                text += f"  ({row['failed_items']} failed)"
+
+        active = self.live_progress.get(row["id"])
+        if active and row["status"] == "running":
+            if row["kind"] != "playlist":
+                text += f"  {describe_progress(next(iter(active.values())))}"
+            else:
+                speed = sum(progress.speed or 0 for progress in active.values())
+                text += f"  {len(active)} downloading at {format_bytes(speed)}/s"
+        return f"{text}\n{name}"
+
+    def _refresh_queue(self, reschedule=True):
+        # list_jobs counts the items of every visible playlist, which gets slow as the history grows, so it
+        # runs on a worker thread and the rows are drawn through the dispatcher.
+        if reschedule:
+            self.after(QUEUE_REFRESH_MS, self._refresh_queue)
+        if self._queue_loading:
+            self._queue_stale = self._queue_stale or not reschedule
+            return
+        self._queue_loading = True
+        threading.Thread(target=self._load_queue, daemon=True).start()
+
+    def _load_queue(self):
+        try:
+            rows = self.job_store.list_jobs(limit=QUEUE_VISIBLE_JOBS)
+        except Exception:
+            rows = None
+        self.ui.push("queue", lambda: self._show_queue(rows))
+
+    def _show_queue(self, rows):
+        self._queue_loading = False
+        if self._queue_stale:
+            self._queue_stale = False
+            self._refresh_queue(reschedule=False)
+        if rows is None:
+            return
+
+        visible_ids = {row["id"] for row in rows}
+
+        for job_id in list(self.queue_rows):
+            if job_id not in visible_ids:
+                self.queue_rows.pop(job_id).destroy()
+
+        for row in reversed(rows):
+            label = self.queue_rows.get(row["id"])
+            if label is None:
+                label = ctk.CTkLabel(
+                    self.queue_list,
+                    font=("SF Pro Display", 11),
+                    justify="left",
+                    anchor="w"
+                )
+                label.pack(fill="x", padx=8, pady=2, side="top", before=self._first_queue_row())
+                self.queue_rows[row["id"]] = label
+            label.configure(
+                text=self._job_row_text(row),
+                text_color=JOB_STATUS_COLORS.get(row["status"], COLORS["text_muted"])
             )
+
+        if rows:
+            self.queue_empty_label.pack_forget()
         else:
-            self.status_label.configure(text="Downloading playlist...", text_color="#fbbf24")
+            self.queue_empty_label.pack(anchor="w", padx=8)
 
-        def run_playlist_download():
-            success_titles = []
-            failure_messages = []
-            total_items = total_items_hint
-            completed_items = 0
-            try:
-                cmd = self._build_yt_dlp_command(url, selected_format, quality, output_template, playlist_mode=True)
-                cmd.extend(["--newline", "--print", "after_move:__DONE__%(title)s"])
-
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1,
-                    env=os.environ
+        running = [row for row in rows if row["status"] == "running"]
+        pending = [row for row in rows if row["status"] == "pending"]
+        if running:
+            total = sum(row["total_items"] or 1 for row in running)
+            finished = sum(row["done_items"] + row["failed_items"] for row in running)
+            finished += sum(
+                progress.percent / 100
+                for row in running
+                for progress in self.live_progress.get(row["id"], {}).values()
+            )
+            if not self.playlist_progress.winfo_ismapped():
+                self._show_playlist_progress()
+            self._set_playlist_progress(finished / total)
+            if not self.probe_counts:
+                self.status_label.configure(
+                    text=f"Queue: {len(running)} running, {len(pending)} pending",
+                    text_color="#fbbf24"
                 )
+        elif self.playlist_progress.winfo_ismapped():
+            self._hide_playlist_progress()
 
-                if process.stdout:
-                    for raw_line in process.stdout:
-                        line = raw_line.strip()
-                        if not line:
-                            continue
-
-                        item_match = re.search(r"Downloading item\s+(\d+)\s+of\s+(\d+)", line)
-                        if item_match:
-                            current, total = item_match.groups()
-                            total_items = max(total_items, int(total))
-                            item_progress = (int(current) - 1) / total_items if total_items else 0
-                            self.after(0, lambda c=current, t=total: self.status_label.configure(
-                                text=f"Downloading playlist... {c}/{t}",
-                                text_color="#fbbf24"
-                            ))
-                            self.after(0, lambda p=item_progress: self._set_playlist_progress(p))
-                            continue
-
-                        if line.startswith("__DONE__"):
-                            success_titles.append(line.replace("__DONE__", "", 1).strip())
-                            completed_items += 1
-                            if total_items:
-                                progress = completed_items / total_items
-                                self.after(0, lambda p=progress: self._set_playlist_progress(p))
-                                self.after(0, lambda c=completed_items, t=total_items: self.status_label.configure(
-                                    text=f"Downloading playlist... {c}/{t}",
-                                    text_color="#fbbf24"
-                                ))
-                            continue
-
-                        if line.startswith("ERROR:"):
-                            failure_messages.append(line)
-
-                return_code = process.wait()
-                success_count = len(success_titles)
-                failure_count = len(failure_messages)
-                self.after(0, lambda: self._set_playlist_progress(1.0))
-
-                if return_code == 0 and success_count > 0:
-                    self.after(0, lambda: self.status_label.configure(
-                        text=f"Playlist complete: {success_count} downloaded",
-                        text_color="#4ade80"
-                    ))
-                    self.after(0, lambda: self.show_success(
-                        f"{output_path}\n\nDownloaded {success_count} item(s) as 'index - YouTube title'"
-                    ))
-                elif success_count > 0:
-                    self.after(0, lambda: self.status_label.configure(
-                        text=f"Playlist finished with issues: {success_count} downloaded, {failure_count} failed",
-                        text_color="#fbbf24"
-                    ))
-                    details = failure_messages[0] if failure_messages else "Some items could not be downloaded."
-                    self.after(0, lambda: self.show_error(
-                        "Playlist Partial Success",
-                        f"Downloaded {success_count} item(s), failed {failure_count}.\n\n{details}"
-                    ))
-                else:
-                    error_text = failure_messages[0] if failure_messages else "No playlist items were downloaded."
-                    self.after(0, lambda: self.status_label.configure(text="Playlist download failed", text_color="#ff6b6b"))
-                    self.after(0, lambda: self.show_error("Playlist Download Failed", error_text))
-            except Exception as e:
-                self.after(0, lambda: self.status_label.configure(text="Error occurred", text_color="#ff6b6b"))
-                self.after(0, lambda: self.show_error("Error", str(e)))
-            finally:
-                self.after(0, lambda: self.download_btn.configure(state="normal"))
-                self.after(0, lambda: self.playlist_btn.configure(state="normal"))
-                self.after(0, lambda: self._set_download_controls(False))
-                self.after(0, self.update_button_state)
+    def _first_queue_row(self):
+        children = self.queue_list.pack_slaves()
+        return children[0] if children else None
+
+    def _on_queue_event(self, job_id, event):
+        if event.kind == "item_progress":
+            progress = event.data["progress"]
+            self.ui.push(
+                ("progress", job_id, progress.index),
+                lambda: self._set_item_progress(job_id, progress.index, progress)
+            )
+        elif event.kind in ("item_done", "item_failed"):
+            index = event.data["index"]
+            self.ui.push(("progress", job_id, index), lambda: self._set_item_progress(job_id, index, None))
+        elif event.kind == "enumerating":
+            self.ui.push(("probe", job_id), lambda c=event.data["count"]: self._set_probe_count(job_id, c))
+        elif event.kind in ("started", "finished"):
+            self.ui.push(("probe", job_id), lambda: self._set_probe_count(job_id, None))
+        if event.kind == "finished":
+            self.ui.push(("finished", job_id), lambda: self._on_job_finished(job_id))
+
+    def _set_item_progress(self, job_id, index, progress):
+        active = self.live_progress.setdefault(job_id, {})
+        if progress is None:
+            active.pop(index, None)
+        else:
+            active[index] = progress
+        if not active:
+            self.live_progress.pop(job_id, None)
+
+    def _set_probe_count(self, job_id, count):
+        if count is None:
+            self.probe_counts.pop(job_id, None)
+        else:
+            self.probe_counts[job_id] = count
+
+        if not self.probe_counts:
+            self.cancel_probe_btn.pack_forget()
+            return
 
-        threading.Thread(target=run_playlist_download, daemon=True).start()
+        found = sum(self.probe_counts.values())
+        jobs = ", ".join(f"#{probe_id}" for probe_id in sorted(self.probe_counts))
+        self.status_label.configure(
+            text=f"Listing playlist {jobs}... {found} item(s) found",
+            text_color="#fbbf24"
+        )
+        if not self.cancel_probe_btn.winfo_ismapped():
+            self.cancel_probe_btn.pack(pady=(0, 6), after=self.status_label)
+
+    def cancel_playlist_probes(self):
+        for job_id in list(self.probe_counts):
+            self.scheduler.cancel(job_id)
+        self.status_label.configure(text="Cancelling playlist listing...", text_color="#fbbf24")
+
+    def _on_job_finished(self, job_id):
+        self.live_progress.pop(job_id, None)
+        self._refresh_cache_stats()
+        row = self.job_store.get_job(job_id)
+        if row is None:
+            return
+
+        if row["status"] == "cancelled":
+            self.status_label.configure(text=f"Job #{job_id} cancelled", text_color=COLORS["text_muted"])
+            return
+
+        if row["kind"] != "playlist":
+            if row["status"] == "completed":
+                actual_file = row["output_file"] or row["output_dir"]
+                self.status_label.configure(
+                    text=f"✓ Saved to: {actual_file}",
+                    text_color="#4ade80"
+                )
+                self.show_success(actual_file)
+            else:
+                error_msg = row["error"] or "Unknown error"
+                if len(error_msg) > 150:
+                    error_msg = error_msg[:150] + "..."
+                self.status_label.configure(text="Download failed", text_color="#ff6b6b")
+                self.show_error("Error", error_msg)
+            return
+
+        items = self.job_store.get_items(job_id)
+        success_count = sum(1 for item in items if item["status"] == "done")
+        failure_count = sum(1 for item in items if item["status"] == "failed")
+
+        if row["status"] == "completed":
+            self.status_label.configure(
+                text=f"Playlist complete: {success_count} downloaded",
+                text_color="#4ade80"
+            )
+            self.show_success(
+                f"{row['output_dir']}\n\nDownloaded {success_count} item(s) as 'index - YouTube title'"
+            )
+        elif row["status"] == "partial":
+            self.status_label.configure(
+                text=f"{success_count} downloaded, {failure_count} failed - Retry Failed downloads just those",
+                text_color="#fbbf24"
+            )
+            self.show_error(
+                "Playlist Partial Success",
+                f"Downloaded {success_count} item(s), failed {failure_count}.\n\n{row['error']}"
+            )
+        else:
+            error_text = row["error"] or "No playlist items were downloaded."
+            self.status_label.configure(text="Playlist download failed", text_color="#ff6b6b")
+            self.show_error("Playlist Download Failed", error_text)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = App()
     app.mainloop()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+import time
+
+from app_support import app_data_dir
+
+ARCHIVE_DB_NAME = "archive.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    video_id TEXT NOT NULL,
+    format TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    converted_at REAL NOT NULL,
+    PRIMARY KEY (video_id, format, quality, output_dir)
+);
+"""
+
+
+def default_archive_path():
+    return os.path.join(app_data_dir(), ARCHIVE_DB_NAME)
+
+
+class DownloadArchive:
+    def __init__(self, path=None):
+        self.path = path or default_archive_path()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, video_id, selected_format, quality, output_dir):
+        key = (video_id, selected_format, quality, os.path.abspath(output_dir))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM archive WHERE video_id = ? AND format = ? AND quality = ? AND output_dir = ?",
+                key
+            ).fetchone()
+        if row is None:
+            return None
+
+        try:
+            if os.path.getsize(row["path"]) == row["size"]:
+                return dict(row)
+        except OSError:
+            pass
+        self.forget(*key)
+        return None
+
+    def record(self, video_id, selected_format, quality, output_dir, path, title=None):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archive "
+                "(video_id, format, quality, output_dir, path, size, title, converted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, selected_format, quality, os.path.abspath(output_dir), path, size, title, time.time())
+            )
+        return True
+
+    def forget(self, video_id, selected_format, quality, output_dir):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM archive WHERE video_id = ? AND format = ? AND quality = ? AND output_dir = ?",
+                (video_id, selected_format, quality, os.path.abspath(output_dir))
+            )
@@ -0,0 +1,288 @@
+import importlib.util
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+
+OUTPUT_FLAG = "-o"
+# Flags whose values change from run to run (tuned fragments, bandwidth grants). They are left out of the
+# instance key and applied to the reused YoutubeDL's params instead, so warm instances keep being reused.
+PER_RUN_OPTIONS = {
+    "--concurrent-fragments": "concurrent_fragment_downloads",
+    "--limit-rate": "ratelimit"
+}
+
+
+def pool_available():
+    return importlib.util.find_spec("yt_dlp") is not None
+
+
+class _LineWriter:
+    encoding = "utf-8"
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._conn.send(("line", line + "\n"))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def close_line(self):
+        if self._buffer:
+            self._conn.send(("line", self._buffer + "\n"))
+            self._buffer = ""
+
+
+def _instance_key(argv, urls):
+    key = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == OUTPUT_FLAG or arg in PER_RUN_OPTIONS:
+            skip = True
+        elif arg not in urls:
+            key.append(arg)
+    return tuple(key)
+
+
+class _RunState:
+    # Tracks the worker's current run so a new rate limit from the parent reaches its live YoutubeDL, even
+    # when it arrives before the download has started.
+    def __init__(self):
+        self.token = None
+        self.ydl = None
+        self.ratelimit = None
+        self.limited = False
+        self._lock = threading.Lock()
+
+    def begin(self, token):
+        with self._lock:
+            self.token = token
+            self.ydl = None
+            self.limited = False
+
+    def attach(self, ydl):
+        with self._lock:
+            self.ydl = ydl
+            if self.limited:
+                ydl.params["ratelimit"] = self.ratelimit
+
+    def set_ratelimit(self, token, rate):
+        with self._lock:
+            if token != self.token:
+                return
+            self.ratelimit = rate
+            self.limited = True
+            if self.ydl is not None:
+                self.ydl.params["ratelimit"] = rate
+
+    def finish(self):
+        with self._lock:
+            self.ydl = None
+
+
+def _download(yt_dlp, instances, argv, state):
+    try:
+        parsed = yt_dlp.parse_options(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 2
+
+    key = _instance_key(argv, parsed.urls)
+    ydl = instances.get(key)
+    if ydl is None:
+        ydl = instances[key] = yt_dlp.YoutubeDL(parsed.ydl_opts)
+    else:
+        ydl.params["outtmpl"] = parsed.ydl_opts["outtmpl"]
+        for param in PER_RUN_OPTIONS.values():
+            ydl.params[param] = parsed.ydl_opts.get(param)
+        ydl._parse_outtmpl()
+        ydl._download_retcode = 0
+    state.attach(ydl)
+
+    try:
+        return ydl.download(parsed.urls)
+    except yt_dlp.utils.DownloadError:
+        return 1
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+
+
+def _receive(conn, runs, state):
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            message = None
+        if message is None:
+            runs.put(None)
+            return
+        kind, token, value = message
+        if kind == "run":
+            state.begin(token)
+            runs.put(value)
+        elif kind == "ratelimit":
+            state.set_ratelimit(token, value)
+
+
+def _worker_main(conn):
+    writer = _LineWriter(conn)
+    sys.stdout = sys.stderr = writer
+    import yt_dlp
+
+    instances = {}
+    runs = queue.Queue()
+    state = _RunState()
+    threading.Thread(target=_receive, args=(conn, runs, state), daemon=True).start()
+    while True:
+        argv = runs.get()
+        if argv is None:
+            return
+        try:
+            returncode = _download(yt_dlp, instances, argv, state)
+        except Exception as e:
+            print(f"ERROR: {e}")
+            returncode = 1
+        state.finish()
+        writer.close_line()
+        conn.send(("exit", returncode))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self._send_lock = threading.Lock()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def send(self, message):
+        with self._send_lock:
+            self.conn.send(message)
+
+    def stop(self):
+        try:
+            self.send(None)
+        except (OSError, ValueError):
+            pass
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+
+    def discard(self):
+        self.process.kill()
+        self.conn.close()
+
+
+class PoolProcess:
+    _tokens = itertools.count()
+
+    def __init__(self, pool, worker, argv):
+        self._pool = pool
+        self._worker = worker
+        self._token = next(PoolProcess._tokens)
+        self._lock = threading.Lock()
+        self.returncode = None
+        self.stdout = self._lines()
+        worker.send(("run", self._token, argv))
+
+    def _lines(self):
+        while self.returncode is None:
+            try:
+                kind, value = self._worker.conn.recv()
+            except (EOFError, OSError):
+                self._finish(-9)
+                return
+            if kind == "line":
+                yield value
+            else:
+                self._finish(value)
+
+    def _finish(self, returncode):
+        with self._lock:
+            if self.returncode is not None:
+                return
+            self.returncode = returncode
+        self._pool._release(self._worker, reusable=returncode != -9)
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        for _ in self.stdout:
+            pass
+        return self.returncode
+
+    def set_rate_limit(self, rate):
+        # Takes effect on the running download; yt-dlp re-reads the limit as it writes each block.
+        if self.returncode is not None:
+            return
+        try:
+            self._worker.send(("ratelimit", self._token, rate))
+        except (OSError, ValueError):
+            pass
+
+    def kill(self):
+        if self.returncode is None:
+            self._worker.kill()
+
+
+class YtDlpPool:
+    def __init__(self, size=1):
+        self.size = max(1, size)
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.warm(self.size)
+
+    def warm(self, count):
+        with self._lock:
+            missing = count - len(self._idle)
+        for _ in range(max(0, missing)):
+            self._release(_Worker(self._context))
+
+    def start(self, argv):
+        with self._lock:
+            worker = None
+            while self._idle and worker is None:
+                candidate = self._idle.pop()
+                if candidate.alive():
+                    worker = candidate
+                else:
+                    candidate.discard()
+        if worker is None:
+            worker = _Worker(self._context)
+        return PoolProcess(self, worker, list(argv))
+
+    def _release(self, worker, reusable=True):
+        with self._lock:
+            if reusable and not self._closed and len(self._idle) < self.size and worker.alive():
+                self._idle.append(worker)
+                return
+        if reusable:
+            worker.stop()
+        else:
+            worker.discard()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from converter_engine import BandwidthLimiter, Job, format_rate, parse_rate
+
+MIB = 1024 * 1024
+
+
+def make_job(parallelism=1):
+    job = Job("playlist", "https://www.youtube.com/playlist?list=PL", "/tmp", "mp3", "128 kbps")
+    job.parallelism = parallelism
+    return job
+
+
+def try_acquire(limiter, job, timeout=0.3):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(limiter.acquire(job)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return thread, result
+
+
+def test_parse_rate_units():
+    assert parse_rate("500K") == 500 * 1024
+    assert parse_rate("2M") == 2 * MIB
+    assert parse_rate("1.5MiB/s") == int(1.5 * MIB)
+    assert parse_rate("1g") == 1024 ** 3
+    for value in (None, "", "0", "off", "unlimited"):
+        assert parse_rate(value) is None
+    with pytest.raises(ValueError):
+        parse_rate("fast")
+
+
+def test_format_rate():
+    assert format_rate(None) == "Unlimited"
+    assert format_rate(5 * MIB) == "5.0MiB/s"
+
+
+def test_unlimited_grants_have_no_rate():
+    limiter = BandwidthLimiter()
+    grant, rate = limiter.acquire(make_job())
+    assert grant is not None and rate is None
+
+
+def test_single_job_splits_cap_between_its_downloads():
+    limiter = BandwidthLimiter(4 * MIB)
+    job = make_job(parallelism=4)
+    rates = [limiter.acquire(job)[1] for _ in range(4)]
+    assert rates == [MIB] * 4
+
+
+def test_new_job_gets_share_from_adjustable_grants():
+    limiter = BandwidthLimiter(4 * MIB)
+    first, second = make_job(parallelism=4), make_job(parallelism=4)
+    applied = {}
+    grants = []
+    for index in range(4):
+        grant, _ = limiter.acquire(first)
+        limiter.attach(grant, lambda rate, index=index: applied.__setitem__(index, rate))
+        grants.append(grant)
+
+    _, result = try_acquire(limiter, second)
+    assert result, "the second job must not wait for the first job's downloads to finish"
+    assert result[0][1] == MIB // 2
+    assert applied == {index: MIB // 2 for index in range(4)}
+
+    limiter.release(result[0][0])
+    limiter.unregister(second)
+    assert set(applied.values()) == {MIB}
+
+
+def test_fixed_grants_hand_freed_bandwidth_to_the_waiting_job():
+    limiter = BandwidthLimiter(4 * MIB)
+    first, second = make_job(parallelism=4), make_job(parallelism=4)
+    grants = [limiter.acquire(first)[0] for _ in range(4)]
+
+    thread, result = try_acquire(limiter, second)
+    assert not result
+    limiter.release(grants[0])
+    thread.join(2)
+    assert result and result[0][1] == MIB // 2
+
+    # The first job is now over its half of the cap, so its next download waits.
+    thread, more = try_acquire(limiter, first)
+    assert not more
+    first.cancel()
+    thread.join(2)
+    assert more == [(None, None)]
+
+
+def test_adjustable_downloads_never_exceed_cap():
+    limiter = BandwidthLimiter(3 * MIB)
+    for _ in range(3):
+        job = make_job(parallelism=2)
+        for _ in range(2):
+            grant, _ = limiter.acquire(job)
+            limiter.attach(grant, lambda rate: None)
+    assert sorted(grant.rate for grant in limiter._grants.values()) == [MIB // 2] * 6
+
+
+def test_uncapped_downloads_count_against_a_new_cap():
+    limiter = BandwidthLimiter()
+    job = make_job(parallelism=4)
+    uncapped = [limiter.acquire(job)[0] for _ in range(3)]
+    limiter.set_rate(2 * MIB)
+
+    thread, result = try_acquire(limiter, job)
+    assert not result
+    for grant in uncapped:
+        limiter.release(grant)
+    thread.join(2)
+    assert result and result[0][1] == MIB // 2
+
+
+def test_setting_a_cap_relimits_adjustable_downloads():
+    limiter = BandwidthLimiter()
+    job = make_job(parallelism=2)
+    applied = []
+    grant, _ = limiter.acquire(job)
+    limiter.attach(grant, applied.append)
+    limiter.set_rate(2 * MIB)
+    limiter.set_rate(None)
+    assert applied == [MIB, None]
+
+
+def test_cancelled_job_stops_waiting():
+    limiter = BandwidthLimiter(MIB)
+    blocker = make_job()
+    limiter.acquire(blocker)
+    job = make_job()
+    thread, result = try_acquire(limiter, job)
+    assert not result
+    job.cancel()
+    thread.join(2)
+    assert result == [(None, None)]
@@ -0,0 +1,111 @@
+import time
+
+from converter_engine import (
+    ConcurrencyController,
+    DownloadSlots,
+    is_permanent_error,
+    is_throttle_error
+)
+
+MIB = 1024 * 1024
+
+
+def test_throttle_halves_the_limit_and_sets_a_backoff():
+    slots = DownloadSlots(8)
+    controller = ConcurrencyController(slots, 8)
+    controller.throttled()
+    assert slots.limit == 4
+    controller.throttled()
+    assert slots.limit == 2
+    assert controller._backoff_until > time.monotonic()
+
+
+def test_limit_never_drops_below_one():
+    slots = DownloadSlots(2)
+    controller = ConcurrencyController(slots, 2)
+    for _ in range(5):
+        controller.throttled()
+    assert slots.limit == 1
+
+
+def test_successes_grow_the_limit_back_to_the_ceiling():
+    slots = DownloadSlots(8)
+    controller = ConcurrencyController(slots, 8)
+    controller.throttled()
+    controller.throttled()
+    limits = []
+    for _ in range(100):
+        controller.succeeded()
+        limits.append(slots.limit)
+        if controller.window is None:
+            break
+    assert controller.window is None
+    assert slots.limit == 8
+    assert limits == sorted(limits)
+
+
+def test_slow_download_halves_the_limit_without_a_backoff():
+    slots = DownloadSlots(4)
+    controller = ConcurrencyController(slots, 4)
+    controller.succeeded(10 * MIB, 1.0)
+    assert slots.limit == 4
+    controller.succeeded(2 * MIB, 1.0)
+    assert slots.limit == 2
+    assert controller._backoff_until == 0
+
+
+def test_download_far_below_its_bandwidth_share_is_slow():
+    slots = DownloadSlots(4)
+    controller = ConcurrencyController(slots, 4)
+    controller.succeeded(MIB, 4.0, expected_rate=2 * MIB)
+    assert slots.limit == 2
+
+
+def test_a_lasting_drop_becomes_the_new_normal():
+    slots = DownloadSlots(8)
+    controller = ConcurrencyController(slots, 8)
+    controller.succeeded(40 * MIB, 1.0)
+    for _ in range(60):
+        controller.succeeded(8 * MIB, 1.0)
+    assert slots.limit == 8
+    assert controller._backoff_until == 0
+
+
+def test_parallel_downloads_are_compared_with_their_share_of_the_link():
+    slots = DownloadSlots(8)
+    controller = ConcurrencyController(slots, 8)
+    controller.succeeded(40 * MIB, 1.0)
+    for _ in range(8):
+        controller.succeeded(5 * MIB, 1.0, sharing=8)
+    assert slots.limit == 8
+
+
+def test_per_connection_limits_do_not_look_like_throttling():
+    slots = DownloadSlots(8)
+    controller = ConcurrencyController(slots, 8)
+    for _ in range(8):
+        controller.succeeded(2 * MIB, 1.0, sharing=8)
+    controller.succeeded(2 * MIB, 1.0)
+    assert slots.limit == 8
+
+
+def test_small_downloads_do_not_update_throughput():
+    controller = ConcurrencyController(DownloadSlots(4), 4)
+    controller.succeeded(1024, 1.0)
+    assert controller.throughput is None
+
+
+def test_lower_ceiling_caps_the_window():
+    slots = DownloadSlots(8)
+    controller = ConcurrencyController(slots, 8)
+    controller.throttled()
+    controller.set_ceiling(2)
+    assert slots.limit == 2
+
+
+def test_error_classification():
+    assert is_throttle_error("ERROR: HTTP Error 429: Too Many Requests")
+    assert not is_throttle_error("ERROR: Video unavailable")
+    assert is_permanent_error("ERROR: [youtube] abc: Private video")
+    assert not is_permanent_error("ERROR: HTTP Error 503")
+
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from download_archive import DownloadArchive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DownloadArchive(str(tmp_path / "archive.sqlite3"))
+    yield archive
+    archive.close()
+
+
+def make_output(tmp_path, name="Title.mp3"):
+    path = tmp_path / name
+    path.write_bytes(b"x" * 100)
+    return str(path)
+
+
+def test_recorded_items_are_found_again(archive, tmp_path):
+    path = make_output(tmp_path)
+    assert archive.record("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path), path, "Title")
+    row = archive.lookup("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path))
+    assert (row["path"], row["title"]) == (path, "Title")
+
+
+def test_lookup_is_keyed_by_format_quality_and_folder(archive, tmp_path):
+    archive.record("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path), make_output(tmp_path))
+    assert archive.lookup("aaaaaaaaaaa", "mp3", "320 kbps", str(tmp_path)) is None
+    assert archive.lookup("aaaaaaaaaaa", "wav", "128 kbps", str(tmp_path)) is None
+    assert archive.lookup("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path / "other")) is None
+
+
+def test_relative_and_absolute_folders_match(archive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archive.record("aaaaaaaaaaa", "mp3", "128 kbps", ".", make_output(tmp_path))
+    assert archive.lookup("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path)) is not None
+
+
+def test_deleted_or_changed_outputs_are_forgotten(archive, tmp_path):
+    path = make_output(tmp_path)
+    archive.record("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path), path)
+    with open(path, "ab") as f:
+        f.write(b"more")
+    assert archive.lookup("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path)) is None
+
+    archive.record("bbbbbbbbbbb", "mp3", "128 kbps", str(tmp_path), path)
+    os.remove(path)
+    assert archive.lookup("bbbbbbbbbbb", "mp3", "128 kbps", str(tmp_path)) is None
+
+
+def test_missing_outputs_are_not_recorded(archive, tmp_path):
+    assert not archive.record("aaaaaaaaaaa", "mp3", "128 kbps", str(tmp_path), str(tmp_path / "missing.mp3"))
@@ -0,0 +1,94 @@
+import json
+import time
+
+import pytest
+
+from converter_engine import PROGRESS_PREFIX, ConverterEngine, FragmentTuner, Job
+
+MIB = 1024 * 1024
+RATES = {1: 5, 2: 8, 4: 10, 8: 20, 16: 15}
+
+
+def test_small_samples_are_ignored():
+    tuner = FragmentTuner()
+    tuner.record(4, 1024, 1.0)
+    assert tuner.current() == 4
+    assert tuner.throughput() == {}
+
+
+def test_unknown_levels_are_ignored():
+    tuner = FragmentTuner()
+    tuner.record(3, 64 * MIB, 1.0)
+    assert tuner.throughput() == {}
+
+
+def test_settles_on_the_fastest_level():
+    tuner = FragmentTuner()
+    for _ in range(6):
+        level = tuner.current()
+        tuner.record(level, RATES[level] * MIB, 1.0)
+    assert tuner.current() == 8
+
+
+def test_remeasures_the_next_level_now_and_then():
+    tuner = FragmentTuner()
+    visits = []
+    for _ in range(30):
+        level = tuner.current()
+        visits.append(level)
+        tuner.record(level, RATES[level] * MIB, 1.0)
+    assert visits.count(16) >= 2
+    assert set(visits) <= {4, 8, 16}
+
+
+class FakeProcess:
+    def __init__(self, lines):
+        self.lines = lines
+
+    @property
+    def stdout(self):
+        for line in self.lines:
+            time.sleep(0.01)
+            yield line
+
+    def wait(self):
+        return 0
+
+    def poll(self):
+        return 0
+
+    def kill(self):
+        pass
+
+
+class FakeBackend:
+    def __init__(self, fragment_count):
+        self.fragment_count = fragment_count
+
+    def executable(self):
+        return "yt-dlp"
+
+    def supports(self, flag):
+        return True
+
+    def spawn(self, cmd, merge_stderr=True):
+        lines = []
+        for done in (0, 32 * MIB):
+            data = {"status": "downloading", "downloaded_bytes": done, "filename": "a.webm"}
+            if self.fragment_count:
+                data["fragment_count"] = self.fragment_count
+            lines.append(PROGRESS_PREFIX + json.dumps(data) + "\n")
+        return FakeProcess(lines)
+
+
+@pytest.mark.parametrize("fragment_count, rate_limit, recorded", [
+    (40, None, True),
+    (None, None, False),
+    (40, 8 * MIB, False)
+])
+def test_engine_records_only_fragmented_uncapped_downloads(fragment_count, rate_limit, recorded):
+    engine = ConverterEngine(backend=FakeBackend(fragment_count), rate_limit=rate_limit)
+    job = Job("single", "https://youtu.be/aaaaaaaaaaa", "/tmp", "m4a", "128 kbps")
+    result = engine._run_yt_dlp(job, ["yt-dlp", job.url], 1, "aaaaaaaaaaa")
+    assert result.returncode == 0
+    assert bool(engine.fragment_tuner.throughput()) is recorded
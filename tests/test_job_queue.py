@@ -0,0 +1,260 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from converter_engine import BandwidthLimiter, ConcurrencyController, DownloadSlots, Job, PlaylistEntry
+from job_queue import LEASE_TIMEOUT, JobScheduler, JobStore
+
+OWNER = os.getpid()
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PL"
+
+
+class FakeEngine:
+    # Stands in for ConverterEngine: each job replays a scripted list of events on its own thread.
+    def __init__(self, script):
+        self.script = script
+        self.workers = 1
+        self.controller = ConcurrencyController(DownloadSlots())
+        self.bandwidth = BandwidthLimiter()
+        self.calls = []
+
+    def _start(self, kind, url, output_dir, selected_format, quality, listener, **kwargs):
+        self.calls.append((kind, url, kwargs))
+        job = Job(kind, url, output_dir, selected_format, quality)
+        job.add_listener(listener)
+        threading.Thread(target=self.script, args=(job, kwargs), daemon=True).start()
+        return job
+
+    def convert(self, url, output_dir, filename, selected_format, quality=None, listener=None):
+        return self._start("single", url, output_dir, selected_format, quality, listener, filename=filename)
+
+    def convert_playlist(self, url, output_dir, selected_format, quality=None, items=None, listener=None):
+        return self._start("playlist", url, output_dir, selected_format, quality, listener, items=items)
+
+
+def entries(count):
+    return [PlaylistEntry(index, f"video{index:06d}") for index in range(1, count + 1)]
+
+
+def playlist_script(failed=(), status="completed", error=None):
+    def script(job, kwargs):
+        items = kwargs["items"] or entries(3)
+        job.emit("started", total=len(items), items=items)
+        for entry in items:
+            if entry.index in failed:
+                job.emit("item_failed", index=entry.index, error=f"ERROR: item {entry.index} failed")
+            else:
+                job.emit("item_done", index=entry.index, title=f"Title {entry.index}")
+        job._finish(status, error)
+    return script
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "queue.sqlite3"))
+    yield store
+    store.close()
+
+
+def add_playlist(store):
+    return store.add_job("playlist", PLAYLIST_URL, "/tmp", "mp3", "128 kbps")
+
+
+def run_queue(store, engine):
+    scheduler = JobScheduler(store, engine, concurrency=2).start()
+    try:
+        assert scheduler.wait_idle(5)
+    finally:
+        scheduler.stop()
+    return scheduler
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_claim_next_takes_jobs_in_order(store):
+    first, second = add_playlist(store), add_playlist(store)
+    claimed = store.claim_next(100)
+    assert claimed["id"] == first
+    assert claimed["status"] == "running" and claimed["owner"] == 100
+    assert store.claim_next(100, exclude=[first])["id"] == second
+    assert store.claim_next(100) is None
+
+
+def test_a_job_is_claimed_by_one_store_only(store):
+    other = JobStore(store.path)
+    try:
+        job_id = add_playlist(store)
+        assert other.claim_next(200)["id"] == job_id
+        assert store.claim_next(100) is None
+        assert store.get_job(job_id)["owner"] == 200
+    finally:
+        other.close()
+
+
+def test_reset_keeps_jobs_of_live_owners(store):
+    job_id = add_playlist(store)
+    store.claim_next(OWNER)
+    assert store.reset_interrupted() == []
+    assert store.get_job(job_id)["status"] == "running"
+    assert store.reset_interrupted(OWNER) == [job_id]
+    job = store.get_job(job_id)
+    assert job["status"] == "pending" and job["owner"] is None
+
+
+def test_reset_reclaims_jobs_of_dead_owners(store):
+    job_id = add_playlist(store)
+    store.claim_next(dead_pid())
+    assert store.reset_interrupted() == [job_id]
+
+
+def test_reset_reclaims_stale_leases(store):
+    job_id = add_playlist(store)
+    store.claim_next(OWNER)
+    store._execute("UPDATE jobs SET heartbeat = ?", (time.time() - LEASE_TIMEOUT - 1,))
+    assert store.reset_interrupted() == [job_id]
+
+
+def test_renew_leases_keeps_a_job_claimed(store):
+    job_id = add_playlist(store)
+    store.claim_next(OWNER)
+    store._execute("UPDATE jobs SET heartbeat = ?", (time.time() - LEASE_TIMEOUT - 1,))
+    store.renew_leases(OWNER)
+    assert store.reset_interrupted() == []
+    assert store.get_job(job_id)["status"] == "running"
+
+
+def test_reset_moves_ownerless_running_jobs_back(store):
+    job_id = add_playlist(store)
+    store.set_job_status(job_id, "running")
+    assert store.reset_interrupted() == [job_id]
+
+
+def test_clear_finished_keeps_active_jobs(store):
+    done, pending = add_playlist(store), add_playlist(store)
+    store.set_job_status(done, "completed")
+    store.clear_finished()
+    assert [row["id"] for row in store.list_jobs()] == [pending]
+    assert store.count_active() == 1
+
+
+def test_scheduler_records_single_job_output(store):
+    def script(job, kwargs):
+        job.output_files.append("/tmp/out.mp3")
+        job._finish("completed")
+
+    job_id = store.add_job("single", "https://youtu.be/aaaaaaaaaaa", "/tmp", "mp3", "128 kbps", "out")
+    run_queue(store, FakeEngine(script))
+    job = store.get_job(job_id)
+    assert (job["status"], job["output_file"]) == ("completed", "/tmp/out.mp3")
+
+
+def test_scheduler_records_playlist_items(store):
+    job_id = add_playlist(store)
+    run_queue(store, FakeEngine(playlist_script(failed={2})))
+    job = store.get_job(job_id)
+    assert (job["status"], job["error"]) == ("partial", "ERROR: item 2 failed")
+    assert [item["status"] for item in store.get_items(job_id)] == ["done", "failed", "done"]
+
+
+def test_scheduler_resumes_playlists_from_pending_items(store):
+    job_id = add_playlist(store)
+    store.set_items(job_id, entries(3))
+    store.mark_item(job_id, 1, "done")
+    engine = FakeEngine(playlist_script())
+    run_queue(store, engine)
+    assert [entry.index for entry in engine.calls[0][2]["items"]] == [2, 3]
+    assert store.get_job(job_id)["status"] == "completed"
+
+
+@pytest.mark.parametrize("converted, status", [(0, "failed"), (1, "partial")])
+def test_engine_errors_after_listing_keep_items_retryable(store, converted, status):
+    def script(job, kwargs):
+        items = entries(3)
+        job.emit("started", total=len(items), items=items)
+        for entry in items[:converted]:
+            job.emit("item_done", index=entry.index)
+        job._finish("failed", "[Errno 13] Permission denied: '/music'")
+
+    job_id = add_playlist(store)
+    run_queue(store, FakeEngine(script))
+    job = store.get_job(job_id)
+    assert (job["status"], job["error"]) == (status, "[Errno 13] Permission denied: '/music'")
+    assert len(store.get_items(job_id, "pending")) == 3 - converted
+    assert store.retry_failed(job_id)
+
+
+def test_scheduler_fails_jobs_the_engine_cannot_start(store):
+    class BrokenEngine(FakeEngine):
+        def convert_playlist(self, *args, **kwargs):
+            raise FileNotFoundError("yt-dlp was not found")
+
+    job_id = add_playlist(store)
+    run_queue(store, BrokenEngine(None))
+    job = store.get_job(job_id)
+    assert (job["status"], job["error"]) == ("failed", "yt-dlp was not found")
+
+
+def test_cancelling_a_pending_job(store):
+    job_id = add_playlist(store)
+    scheduler = JobScheduler(store, FakeEngine(playlist_script()))
+    assert scheduler.cancel(job_id)
+    assert store.get_job(job_id)["status"] == "cancelled"
+
+
+def test_settings(store):
+    assert store.get_setting("rate_limit", "none") == "none"
+    store.set_setting("rate_limit", 1024)
+    store.set_setting("rate_limit", 2048)
+    assert store.get_setting("rate_limit") == "2048"
+    store.set_setting("rate_limit", None)
+    assert store.get_setting("rate_limit", "none") is None
+
+
+def test_retry_failed_requeues_only_failed_items(store):
+    job_id = add_playlist(store)
+    store.set_items(job_id, entries(3))
+    store.mark_item(job_id, 1, "done")
+    store.mark_item(job_id, 2, "failed", error="ERROR: Video unavailable")
+    store.mark_item(job_id, 3, "failed", error="ERROR: HTTP Error 503")
+    store.set_job_status(job_id, "partial", error="2 item(s) failed")
+
+    assert [row["id"] for row in store.retryable_jobs()] == [job_id]
+    assert store.retry_failed(job_id)
+    assert [entry.index for entry in store.get_entries(job_id, "pending")] == [2, 3]
+    assert [item["idx"] for item in store.get_items(job_id, "done")] == [1]
+    job = store.get_job(job_id)
+    assert job["status"] == "pending" and job["error"] is None
+
+
+def test_retry_failed_ignores_finished_and_active_jobs(store):
+    job_id = add_playlist(store)
+    assert not store.retry_failed(job_id)
+    store.set_job_status(job_id, "completed")
+    assert not store.retry_failed(job_id)
+
+
+def test_scheduler_retries_only_the_failed_items(store):
+    failing = {2}
+    engine = FakeEngine(lambda job, kwargs: playlist_script(failed=set(failing))(job, kwargs))
+    job_id = add_playlist(store)
+    scheduler = JobScheduler(store, engine).start()
+    try:
+        assert scheduler.wait_idle(5)
+        assert store.get_job(job_id)["status"] == "partial"
+
+        failing.clear()
+        assert scheduler.retry_failed(job_id)
+        assert scheduler.wait_idle(5)
+    finally:
+        scheduler.stop()
+    assert [entry.index for entry in engine.calls[1][2]["items"]] == [2]
+    assert store.get_job(job_id)["status"] == "completed"
+    assert {item["status"] for item in store.get_items(job_id)} == {"done"}
@@ -0,0 +1,69 @@
+import pytest
+
+from converter_engine import (
+    extract_video_id,
+    format_eta,
+    format_targets,
+    is_playlist_url,
+    parse_targets,
+    resolve_quality,
+    target_path
+)
+
+
+def test_resolve_quality():
+    assert resolve_quality("mp4", "1080") == "1080p"
+    assert resolve_quality("mp4", "4k") == "2160p (4K)"
+    assert resolve_quality("wav") == "Lossless (16-bit)"
+    with pytest.raises(ValueError):
+        resolve_quality("mp3", "999")
+
+
+def test_is_playlist_url():
+    assert is_playlist_url("https://www.youtube.com/playlist?list=PL123")
+    assert not is_playlist_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+
+def test_format_eta():
+    assert format_eta(None) == "--:--"
+    assert format_eta(75) == "01:15"
+    assert format_eta(3725) == "1:02:05"
+
+
+def test_extract_video_id():
+    assert extract_video_id("https://youtu.be/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    assert extract_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42") == "dQw4w9WgXcQ"
+    assert extract_video_id("https://example.com/video") is None
+
+
+def test_parse_targets_matches_quality_prefixes():
+    assert parse_targets("mp3,wav", "320,24") == [("mp3", "320 kbps"), ("wav", "Lossless (24-bit)")]
+
+
+def test_parse_targets_defaults_missing_qualities():
+    assert parse_targets(" MP3 , m4a ", "192") == [("mp3", "192 kbps"), ("m4a", "128 kbps")]
+
+
+@pytest.mark.parametrize("formats, qualities", [
+    ("", None),
+    ("mp3,mp3", None),
+    ("flac", None),
+    ("mp4,mp3", None),
+    ("mp3", "999")
+])
+def test_parse_targets_rejects_bad_input(formats, qualities):
+    with pytest.raises(ValueError):
+        parse_targets(formats, qualities)
+
+
+def test_format_targets_round_trips():
+    targets = parse_targets("mp3,wav", "256,16")
+    assert parse_targets(*format_targets(targets)) == targets
+
+
+def test_original_target_gets_its_own_name_when_containers_match():
+    targets = [("original", "Best available"), ("m4a", "128 kbps")]
+    assert target_path("/music", "Song", "m4a", "/tmp/src.m4a", targets) == "/music/Song.m4a"
+    assert target_path("/music", "Song", "original", "/tmp/src.m4a", targets) == "/music/Song (original).m4a"
+    assert target_path("/music", "Song", "original", "/tmp/src.webm", targets) == "/music/Song.webm"
+    assert target_path("/music", "Song", "original", "/tmp/src.m4a", targets[:1]) == "/music/Song.m4a"
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from converter_engine import PlaylistProbe, PlaylistProbeError
+
+
+class FakeProcess:
+    def __init__(self, lines, returncode):
+        self.stdout = iter(lines)
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+class FakeBackend:
+    def __init__(self, lines, returncode=0):
+        self.process = FakeProcess(lines, returncode)
+        self.commands = []
+
+    def executable(self):
+        return "yt-dlp"
+
+    def supports(self, flag):
+        return flag == "--lazy-playlist"
+
+    def spawn(self, cmd, merge_stderr=True):
+        self.commands.append(cmd)
+        return self.process
+
+
+def entry_line(index, video_id):
+    return json.dumps({"id": video_id, "title": f"Title {index}", "duration": 60.0, "playlist_index": index}) + "\n"
+
+
+def test_probe_lists_entries_as_they_arrive():
+    backend = FakeBackend([entry_line(1, "aaaaaaaaaaa"), "\n", entry_line(2, "bbbbbbbbbbb")])
+    seen = []
+    entries = PlaylistProbe("https://www.youtube.com/playlist?list=PL", lambda e, n: seen.append(n), backend).run()
+    assert [entry.video_id for entry in entries] == ["aaaaaaaaaaa", "bbbbbbbbbbb"]
+    assert seen == [1, 2]
+    assert "--lazy-playlist" in backend.commands[0]
+
+
+def test_partial_listing_raises_the_error_line():
+    backend = FakeBackend([
+        entry_line(1, "aaaaaaaaaaa"),
+        "WARNING: retrying\n",
+        "ERROR: Unable to download API page: HTTP Error 503: Service Unavailable\n"
+    ], returncode=1)
+    with pytest.raises(PlaylistProbeError, match="HTTP Error 503"):
+        PlaylistProbe("https://www.youtube.com/playlist?list=PL", backend=backend).run()
+
+
+def test_failed_listing_without_error_line_reports_the_exit_code():
+    backend = FakeBackend([], returncode=2)
+    with pytest.raises(PlaylistProbeError, match="exit code 2"):
+        PlaylistProbe("https://www.youtube.com/playlist?list=PL", backend=backend).run()
+
+
+def test_cancelled_probe_returns_nothing():
+    probe = PlaylistProbe("https://www.youtube.com/playlist?list=PL", backend=FakeBackend([], returncode=1))
+    probe.cancel()
+    assert probe.run() == []
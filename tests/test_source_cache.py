@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from source_cache import SourceCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SourceCache(str(tmp_path / "cache"), max_bytes=2500)
+    yield cache
+    cache.close()
+
+
+def make_source(tmp_path, name, size=1000):
+    path = tmp_path / f"{name}.webm"
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def store(cache, tmp_path, video_id, abr=None, best=True, format_id="251"):
+    path = cache.store(video_id, format_id, make_source(tmp_path, video_id), video_id, abr=abr, best=best)
+    cache.release(path)
+    return path
+
+
+def test_store_moves_the_source_into_the_cache(cache, tmp_path):
+    source = make_source(tmp_path, "aaaaaaaaaaa")
+    path = cache.store("aaaaaaaaaaa", "251", source, "Title", best=True)
+    assert not os.path.exists(source)
+    assert os.path.dirname(path) == cache.directory
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(cache, tmp_path):
+    first = store(cache, tmp_path, "aaaaaaaaaaa")
+    store(cache, tmp_path, "bbbbbbbbbbb")
+    cache.release(cache.acquire("aaaaaaaaaaa")["path"])
+    store(cache, tmp_path, "ccccccccccc")
+
+    assert cache.acquire("bbbbbbbbbbb") is None
+    assert os.path.exists(first)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["size"] <= cache.max_bytes
+
+
+def test_pinned_entries_are_not_evicted(cache, tmp_path):
+    pinned = cache.store("aaaaaaaaaaa", "251", make_source(tmp_path, "a"), "a", best=True)
+    store(cache, tmp_path, "bbbbbbbbbbb")
+    store(cache, tmp_path, "ccccccccccc")
+    assert os.path.exists(pinned)
+    assert cache.acquire("bbbbbbbbbbb") is None
+
+    cache.release(pinned)
+    store(cache, tmp_path, "ddddddddddd")
+    assert not os.path.exists(pinned)
+
+
+def test_best_sources_meet_any_target(cache, tmp_path):
+    store(cache, tmp_path, "aaaaaaaaaaa", abr=160.0, best=True)
+    assert cache.acquire("aaaaaaaaaaa") is not None
+    assert cache.acquire("aaaaaaaaaaa", 300) is not None
+
+
+def test_bitrate_sources_are_only_reused_for_lower_targets(cache, tmp_path):
+    store(cache, tmp_path, "aaaaaaaaaaa", abr=130.0, best=False)
+    assert cache.acquire("aaaaaaaaaaa") is None
+    assert cache.acquire("aaaaaaaaaaa", 182) is None
+    assert cache.acquire("aaaaaaaaaaa", 121)["abr"] == 130.0
+
+
+def test_better_entry_is_found_next_to_a_weaker_one(cache, tmp_path):
+    store(cache, tmp_path, "aaaaaaaaaaa", abr=130.0, best=False, format_id="140")
+    store(cache, tmp_path, "aaaaaaaaaaa", abr=160.0, best=True, format_id="251")
+    assert cache.acquire("aaaaaaaaaaa")["format_id"] == "251"
+
+
+def test_changed_files_are_dropped(cache, tmp_path):
+    path = store(cache, tmp_path, "aaaaaaaaaaa")
+    with open(path, "ab") as f:
+        f.write(b"truncated download")
+    assert cache.acquire("aaaaaaaaaaa") is None
+    assert not os.path.exists(path)
+    assert cache.stats()["entries"] == 0
+
+
+def test_hit_rate(cache, tmp_path):
+    assert cache.stats()["hit_rate"] is None
+    store(cache, tmp_path, "aaaaaaaaaaa")
+    cache.acquire("aaaaaaaaaaa")
+    cache.acquire("bbbbbbbbbbb")
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_clear_keeps_pinned_files(cache, tmp_path):
+    pinned = cache.store("aaaaaaaaaaa", "251", make_source(tmp_path, "a"), "a", best=True)
+    store(cache, tmp_path, "bbbbbbbbbbb")
+    cache.clear()
+    assert os.path.exists(pinned)
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from tool_registry import TOOL_ENV_VARS, ToolNotFoundError, ToolRegistry
+
+FAKE_YTDLP = """#!/bin/sh
+echo run >> "{log}"
+case "$1" in
+    --version) echo 2024.01.01 ;;
+    --help) echo "  --lazy-playlist  --limit-rate RATE" ;;
+esac
+"""
+
+
+@pytest.fixture(autouse=True)
+def clean_environment(monkeypatch):
+    for variable in TOOL_ENV_VARS.values():
+        monkeypatch.delenv(variable, raising=False)
+    monkeypatch.setenv("PATH", "")
+
+
+@pytest.fixture
+def fake_ytdlp(tmp_path):
+    directory = tmp_path / "bin"
+    directory.mkdir()
+    path = directory / "yt-dlp"
+    path.write_text(FAKE_YTDLP.format(log=tmp_path / "runs.log"))
+    path.chmod(0o755)
+    return str(path)
+
+
+def probe_runs(tmp_path):
+    try:
+        return len((tmp_path / "runs.log").read_text().splitlines())
+    except FileNotFoundError:
+        return 0
+
+
+def make_registry(tmp_path, search_dirs=()):
+    return ToolRegistry(str(tmp_path / "tools.json"), list(search_dirs))
+
+
+def test_environment_variable_wins(tmp_path, fake_ytdlp, monkeypatch):
+    monkeypatch.setenv("YTC_YTDLP", fake_ytdlp)
+    registry = make_registry(tmp_path)
+    assert registry.path("yt-dlp") == fake_ytdlp
+    assert registry.info("yt-dlp").source == "env"
+
+
+def test_broken_environment_variable_does_not_fall_back(tmp_path, fake_ytdlp, monkeypatch):
+    monkeypatch.setenv("YTC_YTDLP", str(tmp_path / "missing"))
+    registry = make_registry(tmp_path, [os.path.dirname(fake_ytdlp)])
+    assert registry.path("yt-dlp") is None
+    with pytest.raises(ToolNotFoundError):
+        registry.require("yt-dlp")
+
+
+def test_search_dirs_and_configured_paths(tmp_path, fake_ytdlp):
+    registry = make_registry(tmp_path, [os.path.dirname(fake_ytdlp)])
+    assert registry.info("yt-dlp").source == "search"
+    assert registry.path("ffmpeg") is None
+    assert registry.version("ffmpeg") == "Not installed"
+
+    registry = make_registry(tmp_path)
+    assert registry.path("yt-dlp") is None
+    registry.configure("yt-dlp", fake_ytdlp)
+    assert registry.info("yt-dlp").source == "config"
+    assert make_registry(tmp_path).path("yt-dlp") == fake_ytdlp
+
+
+def test_probe_results_are_cached_on_disk(tmp_path, fake_ytdlp, monkeypatch):
+    monkeypatch.setenv("YTC_YTDLP", fake_ytdlp)
+    info = make_registry(tmp_path).info("yt-dlp")
+    assert info.version == "2024.01.01"
+    assert info.capabilities == ["--lazy-playlist", "--limit-rate"]
+    runs = probe_runs(tmp_path)
+    assert runs == 2
+
+    registry = make_registry(tmp_path)
+    assert registry.version("yt-dlp") == "2024.01.01"
+    assert registry.supports("yt-dlp", "--limit-rate")
+    assert not registry.supports("yt-dlp", "--concurrent-fragments")
+    assert probe_runs(tmp_path) == runs
+
+
+def test_changed_binary_is_probed_again(tmp_path, fake_ytdlp, monkeypatch):
+    monkeypatch.setenv("YTC_YTDLP", fake_ytdlp)
+    make_registry(tmp_path).info("yt-dlp")
+    with open(fake_ytdlp, "a") as f:
+        f.write("# upgraded\n")
+    make_registry(tmp_path).info("yt-dlp")
+    assert probe_runs(tmp_path) == 4
+
+
+def test_corrupt_cache_is_ignored(tmp_path, fake_ytdlp, monkeypatch):
+    (tmp_path / "tools.json").write_text("not json")
+    monkeypatch.setenv("YTC_YTDLP", fake_ytdlp)
+    assert make_registry(tmp_path).version("yt-dlp") == "2024.01.01"
@@ -0,0 +1,92 @@
+import pytest
+
+import transcode
+from transcode import (
+    build_ffmpeg_command,
+    can_stream_copy,
+    encoder_args,
+    metadata_args,
+    minimum_source_bitrate,
+    partial_path,
+    source_format_args,
+    stream_probe
+)
+
+
+@pytest.fixture
+def encoders(monkeypatch):
+    available = set()
+    monkeypatch.setattr(transcode, "_has_encoder", lambda name: name in available)
+    return available
+
+
+def test_mp3_uses_the_lame_vbr_scale(encoders):
+    assert encoder_args("mp3", "320 kbps") == ["-c:a", "libmp3lame", "-q:a", "0"]
+    assert encoder_args("mp3", "128 kbps") == ["-c:a", "libmp3lame", "-q:a", "4"]
+
+
+def test_m4a_prefers_fdk_aac(encoders):
+    assert encoder_args("m4a", "320 kbps") == ["-c:a", "aac", "-q:a", "4"]
+    encoders.add("libfdk_aac")
+    assert encoder_args("m4a", "320 kbps") == ["-c:a", "libfdk_aac", "-vbr", "5"]
+
+
+def test_wav_bit_depth(encoders):
+    assert encoder_args("wav", "Lossless (24-bit)") == ["-c:a", "pcm_s24le"]
+    assert encoder_args("wav", "anything") == ["-c:a", "pcm_s16le"]
+
+
+def test_video_formats_cannot_be_transcoded(encoders):
+    with pytest.raises(ValueError):
+        encoder_args("mp4", "720p")
+
+
+def test_metadata_args_skip_missing_values():
+    assert metadata_args({"title": "Song", "artist": None}) == ["-metadata", "title=Song"]
+
+
+def test_partial_path_keeps_the_extension():
+    assert partial_path("/music/Song.mp3") == "/music/Song.part.mp3"
+
+
+def test_ffmpeg_command_copies_or_encodes(encoders, monkeypatch):
+    monkeypatch.setattr(transcode.tools, "require", lambda name: name)
+    copy = build_ffmpeg_command("in.m4a", "out.m4a", "m4a", "128 kbps", copy=True)
+    assert copy[copy.index("-c:a") + 1] == "copy"
+    encode = build_ffmpeg_command("in.webm", "out.mp3", "mp3", "128 kbps", {"title": "Song"})
+    assert encode[encode.index("-c:a") + 1] == "libmp3lame"
+    assert encode[-3:] == ["-metadata", "title=Song", "out.mp3"]
+
+
+@pytest.mark.parametrize("probe, selected_format, quality, expected", [
+    ({"codec": "aac", "bit_rate": 129.5}, "m4a", "128 kbps", True),
+    ({"codec": "aac", "bit_rate": 129.5}, "m4a", "192 kbps", False),
+    ({"codec": "aac", "bit_rate": None}, "m4a", "128 kbps", False),
+    ({"codec": "opus", "bit_rate": 160.0}, "m4a", "128 kbps", False),
+    ({"codec": "mp3", "bit_rate": 320.0}, "mp3", "320 kbps", True),
+    ({"codec": "pcm_s16le", "bit_rate": 1411.0}, "wav", "Lossless (16-bit)", True),
+    ({"codec": "pcm_s16le", "bit_rate": 1411.0}, "wav", "Lossless (24-bit)", False),
+    (None, "mp3", "128 kbps", False)
+])
+def test_can_stream_copy(probe, selected_format, quality, expected):
+    assert can_stream_copy(probe, selected_format, quality) is expected
+
+
+def test_stream_probe_maps_yt_dlp_codecs():
+    assert stream_probe({"acodec": "mp4a.40.2", "abr": 129.5}) == {"codec": "aac", "bit_rate": 129.5}
+    assert stream_probe({"acodec": "opus", "abr": None}) == {"codec": "opus", "bit_rate": None}
+
+
+def test_minimum_source_bitrate():
+    assert minimum_source_bitrate([("mp3", "128 kbps"), ("m4a", "192 kbps")]) == int(192 * 0.95)
+    assert minimum_source_bitrate([("mp3", "128 kbps"), ("wav", "Lossless (16-bit)")]) is None
+    assert minimum_source_bitrate([("original", "Best available")]) is None
+    assert minimum_source_bitrate([]) is None
+
+
+def test_source_format_args():
+    assert source_format_args([("wav", "Lossless (16-bit)")]) == ["-f", "bestaudio/best"]
+    args = source_format_args([("m4a", "128 kbps")])
+    assert args[:2] == ["-S", "abr"]
+    assert args[3].startswith("worstaudio[acodec^=mp4a][abr>=121]/")
+    assert "acodec" not in source_format_args([("mp3", "128 kbps"), ("m4a", "128 kbps")])[3]
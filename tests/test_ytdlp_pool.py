@@ -0,0 +1,23 @@
+from ytdlp_pool import _instance_key
+
+URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+
+def test_instance_key_ignores_output_and_urls():
+    first = ["-x", "--audio-format", "mp3", "-o", "a.%(ext)s", URL]
+    second = ["-x", "--audio-format", "mp3", "-o", "b.%(ext)s", "https://youtu.be/bbbbbbbbbbb"]
+    assert _instance_key(first, [URL]) == _instance_key(second, ["https://youtu.be/bbbbbbbbbbb"]) == (
+        "-x", "--audio-format", "mp3"
+    )
+
+
+def test_instance_key_keeps_options_that_change_the_download():
+    assert _instance_key(["-x", "--audio-format", "mp3", URL], [URL]) != _instance_key(
+        ["-x", "--audio-format", "wav", URL], [URL]
+    )
+
+
+def test_instance_key_ignores_per_run_options():
+    first = ["-x", "--concurrent-fragments", "4", "--limit-rate", "512K", "-o", "a.%(ext)s", URL]
+    second = ["-x", "--concurrent-fragments", "16", "-o", "a.%(ext)s", URL]
+    assert _instance_key(first, [URL]) == _instance_key(second, [URL]) == ("-x",)